@@ -1,10 +1,21 @@
 import STcpClient
-from meta import GameMeta
+import threading
+import multiprocessing as mp
+from time import time as clock
+from meta import GameMeta, MCTSMeta
 import numpy as np
-from state import State, Move
+from state import State, Move, STAY
 from mcts import MCTS
+from parallel import RootParallelMCTS
+from timing import TimeManager
 from utils import *
 
+def new_agent(state):
+    if MCTSMeta.WORKERS > 1:
+        return RootParallelMCTS(state, workers=MCTSMeta.WORKERS)
+    else:
+        return MCTS(state)
+
 '''
     選擇起始位置
     選擇範圍僅限場地邊緣(至少一個方向為牆)
@@ -59,8 +70,8 @@ def InitPos(mapStat):
         state.init_pos(tuple(best_pos))
         
         global agent
-        agent = MCTS(state)
-        agent.search(time_budget=GameMeta.TIME_LIMIT*0.9)
+        agent = new_agent(state)
+        agent.search(time_budget=timer.get_budget(), timer=timer)
 
     best_pos = [best_pos[1], best_pos[0]]
     return best_pos
@@ -98,7 +109,7 @@ def GetStep(playerID, mapStat, sheepStat):
     # update the state
     if agent is None: # 1st call after InitPos
         state = State(mapState=mapStat, sheepState=sheepStat, current_player=playerID)
-        agent = MCTS(state)
+        agent = new_agent(state)
     else:
         sources, destinations = find_src_dst(agent.root_state, mapStat, sheepStat)
     
@@ -113,17 +124,24 @@ def GetStep(playerID, mapStat, sheepStat):
                     # ============= for debug purposes, delete before submission =============
                     assert currentPlyer not in destinations
                     # ========================================================================
-                    agent.move_to(Move.freeze(), msg="update")
+                    agent.move_to(STAY, msg="update")
                 else:
                     src = sources[currentPlyer]
                     dst = destinations[currentPlyer]    
                     move = Move.src_dst_to_move(src, dst, sheepStat[dst[0]][dst[1]])
-                    agent.move_to(move, msg="update")
+                    agent.move_to(move.code, msg="update")
 
     assert (agent.root_state.mapState == mapStat).all()
     assert (agent.root_state.sheepState == sheepStat).all()
 
-    agent.search(time_budget=GameMeta.TIME_LIMIT * 0.95)
+    simulate_cnt = agent.simulate_cnt
+    agent.search(time_budget=timer.get_budget(), timer=timer)
+    if isinstance(agent, MCTS):
+        # "retained_cnt" is set by the updates above, the search does not change it
+        print(f"nodes retained: {agent.retained_cnt}, resets: {agent.reset_cnt}")
+        print(f"simulations: {agent.simulate_cnt - simulate_cnt}, {agent.ponder_cnt} from pondering")
+        if agent.table:
+            print(f"table hit rate: {agent.table.hit_rate:.1%}, evictions: {agent.table.evictions}")
     best_move = agent.get_best_move()
     agent.move_to(best_move, "best move")
 
@@ -131,24 +149,71 @@ def GetStep(playerID, mapStat, sheepStat):
 
     # mapStat is column major
     # but self-defined functions are row major
-    step = best_move.get_step()
+    step = Move.decode(best_move).get_step()
     step[0][0], step[0][1] = step[0][1], step[0][0]
     return step
 
 
-# player initial
-(id_package, playerID, mapStat) = STcpClient.GetMap()
-init_pos = InitPos(mapStat)
-STcpClient.SendInitPos(id_package, init_pos)
-
+# set by main, the client only runs as the main script:
+# processes of parallel agents started with "spawn" (Windows) import this module again
+timer = None
 agent = None
 
-# start game
-while (True):
-    (end_program, id_package, mapStat, sheepStat) = STcpClient.GetBoard()
-    if end_program:
-        STcpClient._StopConnect()
-        break
-    Step = GetStep(playerID, mapStat, sheepStat)
-
-    STcpClient.SendStep(id_package, Step)
+# wait for the next board, searching the current tree meanwhile if pondering
+# return the board and the time it was received, before pondering stops
+def GetBoard():
+    if not MCTSMeta.PONDER or not isinstance(agent, MCTS):
+        board = STcpClient.GetBoard()
+        return board, clock()
+
+    board = []
+    stop = threading.Event()
+    def receive():
+        try:
+            board.append((STcpClient.GetBoard(), clock()))
+        finally:
+            stop.set()
+
+    thread = threading.Thread(target=receive, daemon=True)
+    thread.start()
+    agent.ponder(stop)
+    thread.join()
+    return board[0]
+
+def main():
+    global timer, agent
+    timer = TimeManager()
+
+    # player initial
+    (id_package, playerID, mapStat) = STcpClient.GetMap()
+    timer.start_turn()
+    init_pos = InitPos(mapStat)
+    STcpClient.SendInitPos(id_package, init_pos)
+    timer.end_turn()
+
+    # the agent of InitPos (player 4) searched the board as given by GetMap,
+    # which is not transposed like the boards of GetStep, so it is not reused
+    # closing it stops its worker processes and flushes its profile
+    if agent is not None:
+        agent.close()
+        agent = None
+
+    # start game
+    while (True):
+        (end_program, id_package, mapStat, sheepStat), received = GetBoard()
+        if end_program:
+            if agent is not None:
+                agent.close()
+            print(f"latency p50: {timer.get_latency(50):.3f}s, p99: {timer.get_latency(99):.3f}s, max: {timer.get_latency(100):.3f}s")
+            STcpClient._StopConnect()
+            break
+        timer.start_turn(received)
+        Step = GetStep(playerID, mapStat, sheepStat)
+
+        STcpClient.SendStep(id_package, Step)
+        timer.end_turn()
+        print(f"turn: {timer.turn_time:.3f}s, {timer.saved:.1f}s saved so far, gc: {timer.gc_time:.3f}s")
+
+if __name__ == "__main__":
+    mp.freeze_support() # the agent may be packaged as an .exe
+    main()
@@ -1,6 +1,10 @@
 # Team name: my machine is not learning
 # Team ID: 10
 # Team members: 0613246 李泓賢, 0816039 李品慈, 0816203 陳永諭
+#
+# frozen single-file agent as submitted to the tournament, kept for reference only
+# it is not updated with the modular agent: run Sample.py, which uses mcts.py, timing.py ...
+# (time manager, pondering, gc control, endgame solver & the rest of the search improvements)
 
 import STcpClient
 import numpy as np
@@ -0,0 +1,142 @@
+from meta import GameMeta
+from geometry import Geometry, CELLS, OFF
+import numpy as np
+from state import State
+
+# TIE_POINTS[pattern, i]: points of the i-th player in the order of State.scores_to_points
+# where bit i-1 of "pattern" is set if the i-th score ties with the (i-1)-th one
+# computed by State.scores_to_points itself, whose sharing of ties depends on that order
+def _get_tie_points() -> np.ndarray:
+    table = np.empty((1 << (GameMeta.PLAYERS-1), GameMeta.PLAYERS))
+    for pattern in range(len(table)):
+        scores = {}
+        score = 0
+        for i in range(GameMeta.PLAYERS):
+            if i > 0 and not (pattern >> (i-1)) & 1:
+                score -= 1
+            scores[GameMeta.PLAYERS - i] = score # tied players are ordered by descending player
+        points = State.scores_to_points(scores)
+        table[pattern] = [points[GameMeta.PLAYERS - i] for i in range(GameMeta.PLAYERS)]
+    return table
+
+TIE_POINTS = _get_tie_points()
+
+class BatchSimulator:
+    # play N random games from the same state in lockstep with NumPy
+    # moves are drawn uniformly among valid moves, as in State.get_random_move
+    # boards are (N, cells+1) arrays of tokens / sheep where only the non-wall cells
+    # of the map are kept, and the last column (self.pad) stands for all walls
+
+    def __init__(self, geometry: Geometry, rng: np.random.Generator = None):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.plies = 0 # plies of all games of the last "simulate"
+
+        # board index -> column
+        self.cells = np.array([i for i in range(CELLS) if i not in geometry.walls], dtype=np.intp)
+        self.pad = len(self.cells)
+        column = {i: c for c, i in enumerate(self.cells)}
+
+        # neighbor[column, dir-1] = adjacent column, pad if off-board or wall
+        self.neighbor = np.full((self.pad+1, len(GameMeta.DIRECTIONS)), self.pad, dtype=np.intp)
+        # ray[column, dir-1] = columns towards "dir", padded with pad
+        self.ray = np.full((self.pad+1, len(GameMeta.DIRECTIONS), GameMeta.BOARD_SIZE), self.pad, dtype=np.intp)
+
+        for c, i in enumerate(self.cells):
+            for d in GameMeta.DIRECTIONS:
+                n = geometry.neighbor[i][d]
+                self.neighbor[c, d-1] = self.pad if n == OFF else column[n]
+                cells = [column[n] for n in geometry.ray[i][d]]
+                self.ray[c, d-1, :len(cells)] = cells
+
+    # return a (n, GameMeta.PLAYERS) array, the points of player p of game g are at [g, p-1]
+    # every player must have set the 1st piece
+    def simulate(self, state, n: int) -> np.ndarray:
+        board = np.full((n, self.pad+1), GameMeta.TOKENS["wall"], dtype=np.int8)
+        board[:, :self.pad] = np.asarray(state.mapState, dtype=np.int8).reshape(-1)[self.cells]
+        sheep = np.zeros((n, self.pad+1), dtype=np.int8)
+        sheep[:, :self.pad] = np.asarray(state.sheepState, dtype=np.int8).reshape(-1)[self.cells]
+
+        games = np.arange(n)
+        stuck = np.zeros(n, dtype=np.int8) # consecutive plies without any valid move
+        player = state.current_player
+        self.plies = 0 # plies of all games, passes included as in python rollouts
+
+        while True:
+            running = stuck < GameMeta.PLAYERS
+            if not running.any():
+                break
+            self.plies += int(running.sum())
+
+            # weight of (cell, direction) = number of valid sheep if the direction is open
+            free = board == GameMeta.TOKENS["free"]
+            splits = np.where(board == player, sheep - 1, 0)
+            weights = (free[:, self.neighbor] * splits[:, :, None]).reshape(n, -1)
+            weights[~running] = 0
+
+            cumulative = np.cumsum(weights, axis=1)
+            total = cumulative[:, -1]
+            moving = total > 0
+            stuck = np.where(moving, 0, np.minimum(stuck+1, GameMeta.PLAYERS))
+
+            if moving.any():
+                g = games[moving]
+                r = self.rng.random(len(g)) * total[moving]
+                choice = (cumulative[moving] <= r[:, None]).sum(axis=1)
+                cell, dir = np.divmod(choice, len(GameMeta.DIRECTIONS))
+                num_sheep = self.rng.integers(1, splits[g, cell], endpoint=True)
+
+                # the destination is the last free cell before the first blocked one
+                ray = self.ray[cell, dir]
+                steps = np.argmin(free[g[:, None], ray], axis=1)
+                dest = ray[np.arange(len(g)), steps-1]
+
+                sheep[g, cell] -= num_sheep
+                sheep[g, dest] = num_sheep
+                board[g, dest] = player
+
+            player = player % GameMeta.PLAYERS + 1
+
+        return self.get_points(board)
+
+    # vectorized State.get_points
+    def get_points(self, board: np.ndarray) -> np.ndarray:
+        n = len(board)
+        scores = np.empty((n, GameMeta.PLAYERS))
+        for p in range(1, GameMeta.PLAYERS+1):
+            scores[:, p-1] = 3 * (board[:, :self.pad] == p).sum(axis=1) + self._get_max_region(board, p)
+
+        return self.scores_to_points(scores)
+
+    # State.scores_to_points of every game, "scores" is a (n, GameMeta.PLAYERS) array
+    # players are sorted as State does, by score then player, both descending, and the points
+    # of each position in that order are looked up by the pattern of ties between neighbors
+    @staticmethod
+    def scores_to_points(scores: np.ndarray) -> np.ndarray:
+        players = np.broadcast_to(np.arange(1, GameMeta.PLAYERS+1), scores.shape)
+        order = np.lexsort((-players, -scores), axis=1)
+        ranked = np.take_along_axis(scores, order, axis=1)
+        pattern = ((ranked[:, 1:] == ranked[:, :-1]) << np.arange(GameMeta.PLAYERS-1)).sum(axis=1)
+
+        points = np.empty(scores.shape)
+        np.put_along_axis(points, order, TIE_POINTS[pattern], axis=1)
+        return points
+
+    # size of the largest connected region of "player" of each game
+    def _get_max_region(self, board: np.ndarray, player) -> np.ndarray:
+        n = len(board)
+        owned = board == player
+        owned[:, self.pad] = False
+
+        # propagate the minimum column within each region until stable
+        labels = np.where(owned, np.arange(self.pad+1), self.pad)
+        while True:
+            spread = np.minimum(labels, labels[:, self.neighbor].min(axis=2))
+            spread = np.where(owned, spread, self.pad)
+            if (spread == labels).all():
+                break
+            labels = spread
+
+        sizes = np.zeros((n, self.pad+1), dtype=int)
+        g, cell = np.nonzero(owned)
+        np.add.at(sizes, (g, labels[g, cell]), 1)
+        return sizes[:, :self.pad].max(axis=1)
@@ -0,0 +1,67 @@
+# rollouts/sec of BatchSimulator for several batch sizes vs python rollouts on the same seeded positions
+#   python: State.get_random_move until gameover, one game at a time
+#   batch:  BatchSimulator.simulate of "size" games at once, ties rewarded as in State.scores_to_points
+# the points/game column is the mean reward of player 1, which should agree between the two
+# usage: python bench/batch_rollouts.py [--positions 5] [--rollouts 256] [--sizes 8 64 256]
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+from copy import deepcopy
+from time import perf_counter as clock
+import numpy as np
+
+from batch import BatchSimulator
+from rollouts import get_position
+
+def run_python(positions: list, rollouts: int) -> tuple:
+    plies = 0
+    points = 0
+    start = clock()
+    for seed, position in enumerate(positions):
+        random.seed(seed)
+        for _ in range(rollouts):
+            state = deepcopy(position)
+            while not state.gameover():
+                state.play(state.get_random_move())
+                plies += 1
+            points += state.get_points()[1]
+
+    elapsed = clock() - start
+    games = len(positions) * rollouts
+    return games / elapsed, plies / elapsed, points / games
+
+def run_batch(positions: list, rollouts: int, size: int) -> tuple:
+    plies = 0
+    points = 0
+    start = clock()
+    for seed, position in enumerate(positions):
+        simulator = BatchSimulator(position.geometry, np.random.default_rng(seed))
+        for _ in range(rollouts // size):
+            points += simulator.simulate(position, size)[:, 0].sum()
+            plies += simulator.plies
+
+    elapsed = clock() - start
+    games = len(positions) * (rollouts // size) * size
+    return games / elapsed, plies / elapsed, points / games
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--positions", type=int, default=5)
+    parser.add_argument("--rollouts", type=int, default=256)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[8, 64, 256])
+    args = parser.parse_args()
+
+    positions = [get_position(seed) for seed in range(args.positions)]
+
+    results = {"python": run_python(positions, args.rollouts)}
+    for size in args.sizes:
+        results[f"batch {size}"] = run_batch(positions, args.rollouts, size)
+
+    for name, (per_sec, plies_per_sec, points) in results.items():
+        print(f"{name:>10}: {per_sec:8.1f} rollouts/s {plies_per_sec:10.1f} plies/s {points:5.2f} points/game")
+
+if __name__ == "__main__":
+    main()
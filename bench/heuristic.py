@@ -0,0 +1,77 @@
+# expansions/sec with the mobility heuristic (h_weight != 0) on the same seeded positions
+#   play:   every child is played and its valid moves are enumerated
+#   count:  State.count_moves_after computes the counts from the parent
+# usage: python bench/heuristic.py [--positions 5] [--plies 12] [--time 3]
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+from copy import deepcopy
+from time import perf_counter as clock
+
+from state import State
+from bitstate import BitState
+from mcts import MCTS
+from rollouts import get_position
+
+def play_counts(state, moves: list) -> list:
+    counts = []
+    for move in moves:
+        record = state.play(move)
+        counts.append(len(state.get_valid_moves()))
+        state.undo(record)
+    return counts
+
+def count_counts(state, moves: list) -> list:
+    return state.count_moves_after(moves)
+
+METHODS = {"play": play_counts, "count": count_counts}
+
+# positions of a random game every "plies" plies, where the heuristic of all children is needed
+def get_positions(seed: int, plies: int, engine) -> list:
+    state = get_position(seed)
+    if engine is BitState:
+        state = BitState(state.mapState, state.sheepState, state.current_player)
+
+    positions = []
+    random.seed(seed)
+    while not state.gameover():
+        positions.append(deepcopy(state))
+        for _ in range(plies):
+            if state.gameover():
+                break
+            state.play(state.get_random_move())
+    return positions
+
+def run(positions: list, method, budget: float) -> float:
+    expansions = 0
+    start = clock()
+    while clock() - start < budget:
+        for state in positions:
+            method(state, state.get_valid_moves())
+            expansions += 1
+    return expansions / (clock() - start)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--positions", type=int, default=5)
+    parser.add_argument("--plies", type=int, default=12)
+    parser.add_argument("--time", type=float, default=3.0)
+    args = parser.parse_args()
+
+    for engine in (State, BitState):
+        positions = [p for seed in range(args.positions) for p in get_positions(seed, args.plies, engine)]
+        for name, method in METHODS.items():
+            per_sec = run(positions, method, args.time)
+            print(f"{engine.__name__:>8} {name:>6}: {per_sec:10.1f} expansions/s")
+
+        # the whole search with the heuristic of agent.py
+        agent = MCTS(get_position(0), engine=engine, h_weight=0.1)
+        agent.search(time_budget=args.time)
+        # nodes/s is left out: unvisited children are selected first, so it follows root expansion
+        print(f"{engine.__name__:>8} search: {agent.simulate_cnt / args.time:10.1f} simulations/s")
+
+if __name__ == "__main__":
+    main()
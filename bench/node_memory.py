@@ -0,0 +1,77 @@
+# bytes per node of the MCTS tree
+#   store:  the NodeStore of a search
+#   Node:   the same tree rebuilt from the Node objects MCTS used before the store (LegacyNode)
+# usage: python bench/node_memory.py [--time 5] [--seed 0]
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import tracemalloc
+
+from bitstate import BitState
+from mcts import MCTS
+from rollouts import get_position
+from store import NodeStore, FIELDS, NONE
+
+# the fields of the former mcts.Node, a Python object per tree node with a dict of children
+class LegacyNode:
+    def __init__(self, owner, explore_weight, h_weight, h_decay, move: int = None, parent: object = None, plays=0):
+        self.owner = owner
+        self.move = move
+        self.parent = parent
+        self.plays = plays
+        self.children = {}
+        self.N = 0
+        self.Q = 0
+        self.H = None
+
+        self.explore_weight = explore_weight
+        self.h_weight = h_weight
+        self.h_decay = h_decay
+
+# rebuild the tree of "agent" from LegacyNode objects with the same statistics
+# return the root (nodes are kept alive through it) and the bytes traced while building it
+def build_legacy_tree(agent) -> tuple:
+    store = agent.store
+    args = dict(explore_weight=agent.explore_weight, h_weight=agent.h_weight, h_decay=agent.h_decay)
+
+    tracemalloc.start()
+    nodes = [None] * store.size
+    for i in range(store.size):
+        parent = nodes[store.parent[i]] if store.parent[i] != NONE else None
+        node = LegacyNode(int(store.owner[i]), move=int(store.move[i]), parent=parent, plays=int(store.plays[i]), **args)
+        node.N = int(store.N[i])
+        node.Q = float(store.Q[i])
+        node.H = float(store.H[i]) if agent.h_weight else None
+        if parent is not None:
+            parent.children[node.move] = node
+        nodes[i] = node
+    root = nodes[agent.root]
+    del nodes
+    traced = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return root, traced
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--time", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # searched without tracing, which would slow the search down & leave a much smaller tree
+    agent = MCTS(get_position(args.seed), engine=BitState)
+    agent.search(time_budget=args.time)
+
+    store = agent.store
+    allocated = sum(getattr(store, name).nbytes for name, _ in FIELDS)
+    print(f"{store.size} nodes, capacity {store.capacity}")
+    print(f"{NodeStore.node_bytes():8.1f} bytes/node of the fields")
+    print(f"{allocated / store.size:8.1f} bytes/node allocated by the store")
+
+    # parents come before their children in the store, so one pass rebuilds the tree
+    root, legacy = build_legacy_tree(agent)
+    print(f"{legacy / store.size:8.1f} bytes/node of the same tree as Node objects")
+
+if __name__ == "__main__":
+    main()
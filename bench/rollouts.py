@@ -0,0 +1,71 @@
+# rollouts/sec of the random rollout policies on the same seeded positions
+# usage: python bench/rollouts.py [--positions 5] [--rollouts 200]
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+from copy import deepcopy
+from time import perf_counter as clock
+import numpy as np
+
+from meta import GameMeta
+from state import State
+from bitstate import BitState
+from utils import get_random_board
+
+# the move list is built every ply and a move is chosen from it
+def enumerate_policy(state):
+    return random.choice(state.get_valid_moves())
+
+# a move is drawn directly
+def sample_policy(state):
+    return state.get_random_move()
+
+POLICIES = {"enumerate": enumerate_policy, "sample": sample_policy}
+
+# a random board right after all players set their 1st piece
+def get_position(seed: int) -> State:
+    random.seed(seed)
+    np.random.seed(seed)
+    board = get_random_board()
+    state = State(mapState=board, sheepState=np.zeros_like(board), current_player=1)
+    for _ in range(GameMeta.PLAYERS):
+        state.play(random.choice(state.get_valid_moves()))
+    return state
+
+def run(positions: list, rollouts: int, policy) -> float:
+    plies = 0
+    start = clock()
+    for seed, position in enumerate(positions):
+        random.seed(seed)
+        for _ in range(rollouts):
+            state = deepcopy(position)
+            while not state.gameover():
+                state.play(policy(state))
+                plies += 1
+            state.get_points()
+
+    elapsed = clock() - start
+    return len(positions) * rollouts / elapsed, plies / elapsed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--positions", type=int, default=5)
+    parser.add_argument("--rollouts", type=int, default=200)
+    args = parser.parse_args()
+
+    states = [get_position(seed) for seed in range(args.positions)]
+    engines = {
+        "State": states,
+        "BitState": [BitState(s.mapState, s.sheepState, s.current_player) for s in states],
+    }
+
+    for engine, positions in engines.items():
+        for name, policy in POLICIES.items():
+            per_sec, plies_per_sec = run(positions, args.rollouts, policy)
+            print(f"{engine:>8} {name:>9}: {per_sec:8.1f} rollouts/s {plies_per_sec:10.1f} plies/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# benchmark suite of the engines & MCTS on a fixed corpus of positions, written as JSON
+#   corpus:  seeded random boards (utils.get_random_board) played on by seeded random moves
+#            to the opening (every player placed), the midgame & the endgame
+#   results: operations/sec of the engine calls, rollouts/sec & MCTS iterations/sec per phase
+#   moves:   best moves of the seeded, iteration-budgeted searches, which must stay the same
+#            as long as a change is not meant to change the behavior
+# compare mode flags results slower than the baseline by more than "tolerance" and changed moves
+# usage: python bench/suite.py [--out bench.json] [--compare baseline.json] [--tolerance 0.1]
+#                              [--positions 3] [--time 0.5] [--iterations 300]
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import platform
+import random
+from copy import deepcopy
+from time import perf_counter as clock
+
+from geometry import COORDS
+from group import Group
+from meta import GameMeta
+from state import State, STAY, decode_move
+from bitstate import BitState
+from mcts import MCTS, StoreTree, to_engine
+from rollouts import get_position
+
+ENGINES = {"State": State, "BitState": BitState}
+PHASES = {"opening": 0, "midgame": 20, "endgame": 40} # random plies after every player is placed
+
+# the position of a seeded game "plies" plies after the opening, or its last one before gameover
+def get_phase_position(seed: int, plies: int) -> State:
+    state = get_position(seed)
+    rng = random.Random(seed)
+    for _ in range(plies):
+        move = state.get_random_move(rng)
+        record = state.play(move)
+        state.get_valid_moves() # blocked stacks are only found when moves are generated
+        if state.gameover():
+            state.undo(record)
+            break
+    return state
+
+def get_corpus(positions: int) -> dict:
+    return { phase: [get_phase_position(seed, plies) for seed in range(positions)] for phase, plies in PHASES.items() }
+
+# call "fn" on every item of "items" over and over for "budget" seconds, return calls/sec
+def measure(fn, items: list, budget: float) -> float:
+    calls = 0
+    start = clock()
+    while clock() - start < budget:
+        for item in items:
+            fn(item)
+        calls += len(items)
+    return calls / (clock() - start)
+
+def play_undo(item):
+    state, move = item
+    state.undo(state.play(move))
+
+def get_dest(item):
+    state, cell, dir = item
+    state.get_dest(cell, dir)
+
+def rollout(item):
+    state, rng = item
+    records = []
+    StoreTree.simulate(state, records, rng=rng)
+    for record in reversed(records):
+        state.undo(record)
+
+# a copy of "state" played to the end, get_points needs a finished game
+def play_out(state, seed: int):
+    state = deepcopy(state)
+    StoreTree.simulate(state, [], rng=random.Random(seed))
+    return state
+
+def get_free_cells(state) -> set:
+    return { COORDS[i] for i, (x, y) in enumerate(COORDS) if state.mapState[x][y] == GameMeta.TOKENS["free"] }
+
+def run(args) -> dict:
+    corpus = get_corpus(args.positions)
+    results = {}
+    moves = {}
+
+    for phase, states in corpus.items():
+        free_cells = [get_free_cells(state) for state in states]
+        results[f"Group/{phase}/get_connect_regions"] = measure(lambda cells: Group(cells).get_connect_regions(), free_cells, args.time)
+
+        for name, engine in ENGINES.items():
+            positions = [to_engine(state, engine) for state in states]
+            valid_moves = [(state, move) for state in positions for move in state.get_valid_moves()]
+            stacks = [(state, COORDS[decode_move(move)[0]], decode_move(move)[2]) for state, move in valid_moves if move != STAY and decode_move(move)[1] > 0]
+
+            key = f"{name}/{phase}"
+            results[f"{key}/get_valid_moves"] = measure(lambda state: state.get_valid_moves(), positions, args.time)
+            results[f"{key}/play"] = measure(play_undo, valid_moves, args.time)
+            if stacks:
+                results[f"{key}/get_dest"] = measure(get_dest, stacks, args.time)
+            results[f"{key}/gameover"] = measure(lambda state: state.gameover(), positions, args.time)
+            results[f"{key}/get_points"] = measure(lambda state: state.get_points(), [play_out(state, seed) for seed, state in enumerate(positions)], args.time)
+            results[f"{key}/rollouts"] = measure(rollout, [(state, random.Random(seed)) for seed, state in enumerate(positions)], args.time)
+
+            # seeded searches with a fixed number of iterations
+            start = clock()
+            moves[key] = []
+            for seed, state in enumerate(positions):
+                agent = MCTS(state, engine=engine, seed=seed)
+                agent.search(iterations=args.iterations)
+                moves[key].append(agent.get_best_move())
+            results[f"{key}/search_iterations"] = len(positions) * args.iterations / (clock() - start)
+
+    return {
+        "config": {"positions": args.positions, "iterations": args.iterations},
+        "python": platform.python_version(),
+        "results": results, # calls/sec
+        "moves": moves,
+    }
+
+# print every result against "baseline", return whether something regressed or behaves differently
+def compare(report: dict, baseline: dict, tolerance: float) -> bool:
+    failed = False
+    if report["config"] != baseline["config"]:
+        print(f"config differs from the baseline: {report['config']} vs {baseline['config']}")
+
+    for key, value in report["results"].items():
+        if key not in baseline["results"]:
+            print(f"{key:<40} {value:12.1f}/s (new)")
+            continue
+
+        ratio = value / baseline["results"][key]
+        flag = ""
+        if ratio < 1 - tolerance:
+            flag = "REGRESSION"
+            failed = True
+        elif ratio > 1 + tolerance:
+            flag = "faster"
+        print(f"{key:<40} {value:12.1f}/s {ratio:6.2f}x {flag}")
+
+    if report["config"] == baseline["config"]:
+        for key, moves in report["moves"].items():
+            if key in baseline["moves"] and moves != baseline["moves"][key]:
+                print(f"{key}: best moves changed {baseline['moves'][key]} -> {moves}")
+                failed = True
+
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", default="bench.json")
+    parser.add_argument("--compare", help="baseline JSON written by an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    parser.add_argument("--positions", type=int, default=3)
+    parser.add_argument("--time", type=float, default=0.5)
+    parser.add_argument("--iterations", type=int, default=300)
+    args = parser.parse_args()
+
+    report = run(args)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        sys.exit(1 if compare(report, baseline, args.tolerance) else 0)
+    else:
+        for key, value in report["results"].items():
+            print(f"{key:<40} {value:12.1f}/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+# simulations/sec of tree parallel search per number of workers
+# usage: python bench/tree_parallel.py [--workers 1 2 4 8] [--time 3] [--seed 0]
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+
+from bitstate import BitState
+from parallel import TreeParallelMCTS
+from rollouts import get_position
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--time", type=float, default=3.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--capacity", type=int, default=1 << 20)
+    args = parser.parse_args()
+
+    state = get_position(args.seed)
+    for workers in args.workers:
+        agent = TreeParallelMCTS(state, workers=workers, capacity=args.capacity, seed=args.seed, engine=BitState)
+        agent.search(time_budget=args.time)
+        per_sec = agent.simulate_cnt / args.time
+        print(f"{workers:>3} workers: {per_sec:8.1f} simulations/s {per_sec / workers:8.1f} per worker, {agent.store.size} nodes")
+        agent.close()
+
+if __name__ == "__main__":
+    main()
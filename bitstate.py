@@ -0,0 +1,425 @@
+from meta import GameMeta
+from geometry import Geometry, CELLS, COORDS, NEIGHBORS, OFF, to_index
+from state import State, STAY, encode_move, encode_init, decode_move, is_init
+from utils import print_state
+from zobrist import CELL_KEYS, PLAYER_KEYS, get_hash
+import numpy as np
+import random
+
+# bit i of a board represents the cell with index i (see geometry.py)
+FULL = (1 << CELLS) - 1
+FIRST_COL = sum(1 << i for i, (_, y) in enumerate(COORDS) if y == 0)
+LAST_COL = sum(1 << i for i, (_, y) in enumerate(COORDS) if y == GameMeta.BOARD_SIZE-1)
+EVEN_ROWS = sum(1 << i for i, (x, _) in enumerate(COORDS) if x % 2 == 0)
+ODD_ROWS = FULL & ~EVEN_ROWS
+
+# NEIGHBOR_MASK[index] = bits of all cells adjacent to "index"
+NEIGHBOR_MASK = [sum(1 << n for n in row if n != OFF) for row in NEIGHBORS]
+
+# return bits of all cells adjacent to any cell in "bits"
+def spread(bits: int) -> int:
+    even = bits & EVEN_ROWS
+    odd = bits & ODD_ROWS
+
+    adjacent = ((bits & ~FIRST_COL) >> 1) | ((bits & ~LAST_COL) << 1) # 3, 4
+    adjacent |= (bits >> 12) | (bits << 12)                             # straight up & down
+    adjacent |= ((even & ~FIRST_COL) >> 13) | ((even & ~FIRST_COL) << 11) # 1, 5 of even rows
+    adjacent |= ((odd & ~LAST_COL) >> 11) | ((odd & ~LAST_COL) << 13)     # 2, 6 of odd rows
+
+    return adjacent & FULL
+
+# yield indices of set bits
+def iter_bits(bits: int):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+class BitState:
+    # same interface as State, but the board is kept as 144-bit integers
+    #   free:        empty cells (neither wall nor sheep)
+    #   owned[p]:    cells occupied by player p
+    #   splittable:  cells with more than 1 sheep
+    #   sheep:       number of sheep of each cell
+    # a stack is blocked iff it is not splittable or has no free neighbor,
+    # so there is no lazy FREE/BLOCKED bookkeeping to maintain or undo
+
+    def __init__(self, mapState: list, sheepState: list, current_player):
+        self.current_player = current_player # 1 ~ GameMeta.PLAYERS
+        self.geometry = Geometry.from_map(mapState)
+        self.hash = get_hash(mapState, sheepState, current_player) # Zobrist hash, see zobrist.py
+
+        self.free = 0
+        self.owned = [0] * (GameMeta.PLAYERS+1) # index 0 is unused
+        self.splittable = 0
+        self.sheep = bytearray(CELLS)
+
+        for i, (x, y) in enumerate(COORDS):
+            token = mapState[x][y]
+            if token == GameMeta.TOKENS["free"]:
+                self.free |= 1 << i
+            elif token != GameMeta.TOKENS["wall"]:
+                self.owned[int(token)] |= 1 << i
+                self.sheep[i] = int(sheepState[x][y])
+                if self.sheep[i] > 1:
+                    self.splittable |= 1 << i
+
+    def copy(self) -> "BitState":
+        other = BitState.__new__(BitState)
+        other.current_player = self.current_player
+        other.geometry = self.geometry
+        other.hash = self.hash
+        other.free = self.free
+        other.owned = self.owned[:]
+        other.splittable = self.splittable
+        other.sheep = self.sheep[:]
+        return other
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    # ************************************************************************
+    # ********************** State compatible accessors **********************
+    # ************************************************************************
+
+    @property
+    def mapState(self):
+        board = np.full((GameMeta.BOARD_SIZE, GameMeta.BOARD_SIZE), GameMeta.TOKENS["wall"])
+        for i in iter_bits(self.free):
+            board[COORDS[i]] = GameMeta.TOKENS["free"]
+        for p in range(1, GameMeta.PLAYERS+1):
+            for i in iter_bits(self.owned[p]):
+                board[COORDS[i]] = p
+        return board
+
+    @property
+    def sheepState(self):
+        return np.array(self.sheep).reshape((GameMeta.BOARD_SIZE, GameMeta.BOARD_SIZE))
+
+    @property
+    def cell_owners(self) -> dict:
+        cell_owners = {}
+        for p in range(1, GameMeta.PLAYERS+1):
+            movable = self._get_movable(p)
+            cell_owners[p] = {
+                State.FREE: {COORDS[i] for i in iter_bits(movable)},
+                State.BLOCKED: {COORDS[i] for i in iter_bits(self.owned[p] & ~movable)},
+            }
+        return cell_owners
+
+    def print_state(self):
+        print_state(self.mapState, self.sheepState)
+
+    get_next_player = staticmethod(State.get_next_player)
+
+    def get_play_cnt(self, player):
+        return self.owned[player].bit_count()
+
+    # ************************************************************************
+    # ******************************* playing ********************************
+    # ************************************************************************
+
+    # find the destination of moving from "cell" towards "dir"
+    def get_dest(self, cell: tuple, dir: int) -> tuple:
+        return COORDS[self._get_dest(to_index(cell), dir)]
+
+    def _get_dest(self, index: int, dir: int) -> int:
+        dest = index
+        for n in self.geometry.ray[index][dir]:
+            if not (self.free >> n) & 1:
+                break
+            dest = n
+
+        return dest
+
+    # return an undo record which can be passed to "undo" to restore the state
+    # record: (move, player who played, destination index, hash)
+    def play(self, move: int) -> tuple:
+        player = self.current_player
+        hash = self.hash
+        self.current_player = self.get_next_player(player)
+        self.hash ^= PLAYER_KEYS[player] ^ PLAYER_KEYS[self.current_player]
+
+        if move == STAY:
+            return (move, player, None, hash)
+
+        keys = CELL_KEYS
+        src, sheep, dir = decode_move(move)
+        if sheep == 0: # init
+            dest = src
+            self.sheep[dest] = GameMeta.MAX_SHEEP
+        else:
+            dest = self._get_dest(src, dir)
+            self.hash ^= keys[src][player][self.sheep[src]] ^ keys[src][player][self.sheep[src] - sheep]
+            self.sheep[src] -= sheep
+            self.sheep[dest] = sheep
+            if self.sheep[src] <= 1:
+                self.splittable &= ~(1 << src)
+        self.hash ^= keys[dest][player][self.sheep[dest]]
+
+        bit = 1 << dest
+        self.free &= ~bit
+        self.owned[player] |= bit
+        if self.sheep[dest] > 1:
+            self.splittable |= bit
+
+        return (move, player, dest, hash)
+
+    # return the hash after playing "move" without playing it
+    def get_hash_after(self, move: int) -> int:
+        player = self.current_player
+        hash = self.hash ^ PLAYER_KEYS[player] ^ PLAYER_KEYS[self.get_next_player(player)]
+        if move == STAY:
+            return hash
+
+        src, sheep, dir = decode_move(move)
+        keys = CELL_KEYS[src][player]
+        if sheep == 0:
+            return hash ^ keys[GameMeta.MAX_SHEEP]
+
+        left = self.sheep[src] - sheep
+        return hash ^ keys[left + sheep] ^ keys[left] ^ CELL_KEYS[self._get_dest(src, dir)][player][sheep]
+
+    # pass the turn of players who can no longer move, see State.fast_forward
+    def fast_forward(self):
+        player = self.current_player
+        record = (STAY, player, None, self.hash)
+
+        movable = self.splittable & spread(self.free)
+        while self.owned[self.current_player] and not self.owned[self.current_player] & movable:
+            next_player = self.get_next_player(self.current_player)
+            self.hash ^= PLAYER_KEYS[self.current_player] ^ PLAYER_KEYS[next_player]
+            self.current_player = next_player
+
+            # ============= for debug purposes, delete before submission =============
+            if self.current_player == player:
+                raise ValueError("Every player is blocked, the game is over.")
+            # ========================================================================
+
+        return record if self.current_player != player else None
+
+    # revert a "play"
+    # records must be undone in the reverse order of the plays
+    def undo(self, record: tuple):
+        move, player, dest, self.hash = record
+        self.current_player = player
+
+        if move == STAY:
+            return
+
+        if not is_init(move):
+            src, sheep, _ = decode_move(move)
+            self.sheep[src] += sheep
+            if self.sheep[src] > 1:
+                self.splittable |= 1 << src
+
+        bit = 1 << dest
+        self.free |= bit
+        self.owned[player] &= ~bit
+        self.splittable &= ~bit
+        self.sheep[dest] = 0
+
+    # ************************************************************************
+    # ************************** for move selections *************************
+    # ************************************************************************
+
+    # return bits of stacks of "player" that can still move
+    def _get_movable(self, player) -> int:
+        return self.owned[player] & self.splittable & spread(self.free)
+
+    def get_valid_moves(self) -> list:
+        if self.owned[self.current_player] == 0:
+            return self._get_valid_init_moves()
+
+        valid_move_list = []
+        for i in iter_bits(self._get_movable(self.current_player)):
+            valid_sheep = range(1, self.sheep[i])
+            adjacent = self.geometry.neighbor[i]
+
+            for direction in GameMeta.DIRECTIONS:
+                n = adjacent[direction]
+                if n == OFF or not (self.free >> n) & 1:
+                    continue
+
+                base = encode_move(i, 0, direction)
+                for num_sheep in valid_sheep:
+                    valid_move_list.append(base | (num_sheep << 3))
+
+        # cannot move at all
+        if len(valid_move_list) == 0:
+            valid_move_list.append(STAY)
+
+        return valid_move_list
+
+    # draw a move with the same distribution as random.choice(self.get_valid_moves())
+    # without building the move list, for rollouts (see State.get_random_move)
+    def get_random_move(self, rng=random) -> int:
+        if self.owned[self.current_player] == 0:
+            return rng.choice(self._get_valid_init_moves())
+
+        # every stack is weighted by its number of valid moves
+        stacks = [] # (index, valid directions, number of valid sheep)
+        total = 0
+        free = self.free
+        for i in iter_bits(self._get_movable(self.current_player)):
+            adjacent = self.geometry.neighbor[i]
+            valid_directions = [d for d in GameMeta.DIRECTIONS if adjacent[d] != OFF and (free >> adjacent[d]) & 1]
+            splits = self.sheep[i] - 1
+
+            stacks.append((i, valid_directions, splits))
+            total += len(valid_directions) * splits
+
+        # cannot move at all
+        if total == 0:
+            return STAY
+
+        r = rng.randrange(total)
+        for i, valid_directions, splits in stacks:
+            weight = len(valid_directions) * splits
+            if r < weight:
+                return encode_move(i, r % splits + 1, valid_directions[r // splits])
+            r -= weight
+
+    # see State.count_moves
+    def count_moves(self, player) -> int:
+        count = 0
+        for i in iter_bits(self.owned[player] & self.splittable):
+            count += (NEIGHBOR_MASK[i] & self.free).bit_count() * (self.sheep[i] - 1)
+
+        return count
+
+    # see State.count_moves_after
+    def count_moves_after(self, moves: list) -> list:
+        next_player = self.get_next_player(self.current_player)
+        if self.owned[next_player] == 0:
+            counts = []
+            for move in moves:
+                record = self.play(move)
+                counts.append(len(self.get_valid_moves()))
+                self.undo(record)
+            return counts
+
+        base = self.count_moves(next_player)
+        stacks = self.owned[next_player] & self.splittable
+        dests = {}
+        counts = []
+        for move in moves:
+            if move == STAY:
+                count = base
+            else:
+                src, sheep, dir = decode_move(move)
+                count = dests.get((src, dir))
+                if count is None:
+                    dest = self._get_dest(src, dir) if sheep else src
+                    count = base - sum(self.sheep[n] - 1 for n in iter_bits(NEIGHBOR_MASK[dest] & stacks))
+                    dests[(src, dir)] = count
+
+            counts.append(max(count, 1))
+
+        return counts
+
+    def _get_valid_init_moves(self) -> list:
+        # 1. a valid init pos must be adjacent to at least 1 wall
+        # 2. it makes no sense to init at a cell blocked in all 6 directions
+        valid_moves = []
+        for i in iter_bits(self.free & spread(self.free)):
+            if OFF in self.geometry.neighbor[i][1:]:
+                valid_moves.append(encode_init(i))
+
+        return valid_moves
+
+    # ************************************************************************
+    # ************************ for score calculations ************************
+    # ************************************************************************
+
+    def gameover(self) -> bool:
+        # the game has not started until everyone has set the 1st piece
+        for p in range(1, GameMeta.PLAYERS+1):
+            if self.owned[p] == 0:
+                return False
+
+        return self.splittable & spread(self.free) == 0
+
+    # return points of all players based on rankings & scores
+    def get_points(self) -> dict:
+        return State.scores_to_points({
+            p: self._get_score(p) for p in range(1, GameMeta.PLAYERS+1)
+        })
+
+    # see State.count_reachable_free
+    def count_reachable_free(self) -> int:
+        reachable = spread(self.splittable & spread(self.free)) & self.free
+        while True:
+            grown = (reachable | spread(reachable)) & self.free
+            if grown == reachable:
+                break
+            reachable = grown
+
+        return reachable.bit_count()
+
+    # see State.get_free_regions
+    def get_free_regions(self) -> tuple:
+        regions = [] # bits of each region
+        cells = self.free
+        while cells:
+            region = cells & -cells
+            while True:
+                grown = (region | spread(region)) & self.free
+                if grown == region:
+                    break
+                region = grown
+            cells &= ~region
+            regions.append(region)
+
+        stacks = {}
+        for p in range(1, GameMeta.PLAYERS+1):
+            for i in iter_bits(self._get_movable(p)):
+                adjacent = {r for r, region in enumerate(regions) if region & NEIGHBOR_MASK[i]}
+                stacks[i] = (p, self.sheep[i], adjacent)
+
+        return [tuple(iter_bits(region)) for region in regions], stacks
+
+    # see State.get_decided_points
+    def get_decided_points(self):
+        lower = {}
+        upper = {}
+        for p in range(1, GameMeta.PLAYERS+1):
+            lower[p] = self._get_score(p)
+
+            movable = self._get_movable(p)
+            if movable == 0:
+                upper[p] = lower[p]
+                continue
+
+            # free cells connected to the stacks
+            reachable = spread(movable) & self.free
+            while True:
+                grown = (reachable | spread(reachable)) & self.free
+                if grown == reachable:
+                    break
+                reachable = grown
+
+            splits = sum(self.sheep[i] - 1 for i in iter_bits(movable))
+            upper[p] = 4 * (self.owned[p].bit_count() + min(splits, reachable.bit_count()))
+
+        return State.decided_points(lower, upper)
+
+    # return scores of a player
+    def _get_score(self, player):
+        cells = self.owned[player]
+        score = 3 * cells.bit_count()
+
+        # flood fill the connected regions
+        max_size = 0
+        while cells:
+            region = cells & -cells
+            while True:
+                grown = (region | spread(region)) & cells
+                if grown == region:
+                    break
+                region = grown
+
+            cells &= ~region
+            max_size = max(max_size, region.bit_count())
+
+        return score + max_size
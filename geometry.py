@@ -0,0 +1,99 @@
+from meta import GameMeta
+
+# cells are indexed as x * GameMeta.BOARD_SIZE + y
+CELLS = GameMeta.BOARD_SIZE * GameMeta.BOARD_SIZE
+OFF = -1 # sentinel for neighbors that are off-board (or walls in Geometry)
+
+def get_direction_pattern(cell, dir) -> tuple:
+    x, _ = cell
+
+    if dir == 1:
+        return ((-1, -1) if x % 2 == 0 else (-1, 0))
+    elif dir == 2:
+        return ((-1, 0) if x % 2 == 0 else (-1, 1))
+    elif dir == 3:
+        return (0, -1)
+    elif dir == 4:
+        return (0, 1)
+    elif dir == 5:
+        return ((1, -1) if x % 2 == 0 else (1, 0))
+    elif dir == 6:
+        return ((1, 0) if x % 2 == 0 else (1, 1))
+    # ============= for debug purposes, delete before submission =============
+    else:
+        print(f"Unrecognized direction: {dir}.")
+        raise ValueError()
+    # ========================================================================
+
+def out_of_bound(cell: tuple) -> bool:
+    x, y = cell
+
+    if x < 0 or x >= GameMeta.BOARD_SIZE:
+        return True
+    elif y < 0 or y >= GameMeta.BOARD_SIZE:
+        return True
+    else:
+        return False
+
+def to_index(cell: tuple) -> int:
+    return cell[0] * GameMeta.BOARD_SIZE + cell[1]
+
+# COORDS[index] = (x, y)
+COORDS = [(i, j) for i in range(GameMeta.BOARD_SIZE) for j in range(GameMeta.BOARD_SIZE)]
+
+def _build_neighbors() -> list:
+    neighbors = []
+    for cell in COORDS:
+        row = [OFF] # directions are 1~6, index 0 is unused
+        for d in GameMeta.DIRECTIONS:
+            pat_x, pat_y = get_direction_pattern(cell, d)
+            n = (cell[0]+pat_x, cell[1]+pat_y)
+            row.append(OFF if out_of_bound(n) else to_index(n))
+        neighbors.append(row)
+
+    return neighbors
+
+# NEIGHBORS[index][dir] = index of the adjacent cell, OFF if off-board
+NEIGHBORS = _build_neighbors()
+
+class Geometry:
+    _cache = {} # wall layout -> Geometry
+
+    def __init__(self, walls: frozenset):
+        self.walls = walls # indices of wall cells
+
+        # neighbor[index][dir] = index of the adjacent cell, OFF if off-board or wall
+        self.neighbor = []
+        for row in NEIGHBORS:
+            self.neighbor.append([OFF if n in walls else n for n in row])
+
+        # ray[index][dir] = cells passed when going from "index" towards "dir"
+        # until reaching a wall or the edge of the board, ignoring sheep
+        self.ray = []
+        for i in range(CELLS):
+            rays = [()]
+            for d in GameMeta.DIRECTIONS:
+                cells = []
+                n = self.neighbor[i][d]
+                while n != OFF:
+                    cells.append(n)
+                    n = self.neighbor[n][d]
+                rays.append(tuple(cells))
+            self.ray.append(rays)
+
+    # the tables only depend on walls, which never change during a game
+    # so one instance is shared by all states of the same map
+    @classmethod
+    def from_map(cls, mapState) -> "Geometry":
+        walls = frozenset(
+            i for i, (x, y) in enumerate(COORDS)
+            if mapState[x][y] == GameMeta.TOKENS["wall"]
+        )
+
+        if walls not in cls._cache:
+            cls._cache[walls] = cls(walls)
+        return cls._cache[walls]
+
+    # shared by copies of a state
+    def __deepcopy__(self, memo):
+        return self
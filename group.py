@@ -1,5 +1,5 @@
 from meta import GameMeta
-from utils import get_direction_pattern, out_of_bound
+from geometry import to_index, COORDS, NEIGHBORS, OFF
 from copy import deepcopy
 
 class Group:
@@ -24,11 +24,13 @@ class Group:
             n = stack.pop()
             connected_region.add(n)
 
+            adjacent = NEIGHBORS[to_index(n)]
             for d in GameMeta.DIRECTIONS:
-                pat_x, pat_y = get_direction_pattern(n, d)
-                neighbor = (n[0]+pat_x, n[1]+pat_y)
+                if adjacent[d] == OFF:
+                    continue
 
-                if not out_of_bound(neighbor) and neighbor in nodes:
+                neighbor = COORDS[adjacent[d]]
+                if neighbor in nodes:
                     stack.append(neighbor)
                     nodes.remove(neighbor)
 
@@ -1,215 +1,541 @@
-from math import sqrt, log
+from math import log, sqrt
 from copy import deepcopy
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 import random
 from time import time as clock
 from meta import GameMeta, MCTSMeta
-from state import State, Move
-
-
-class Node:
-    def __init__(self, owner, explore_weight, h_weight, h_decay, move: Move = None, parent: object = None, plays=0):
-        self.owner = owner # current player of the node
-        self.move = move   # how to move from parent to here
-        self.parent = parent
-        self.plays = plays # number of plays of the player (owner) so far
-        self.children = {}
-        self.N = 0         # times this position was visited
-        self.Q = 0         # total points of all leaves stemming from here
-        self.H = None      # heuristics
-        
+import numpy as np
+from state import State, STAY, pack_state, unpack_state
+from batch import BatchSimulator
+from store import NodeStore, NONE
+from transposition import TranspositionTable
+from solver import EndgameSolver, SolverTimeout
+from regions import RegionSimulator
+from timing import TimeManager
+from profiling import SearchProfiler
+
+# return a copy of "state" as an instance of "engine" (State or BitState)
+def to_engine(state, engine=State):
+    if isinstance(state, engine):
+        return deepcopy(state) # probably no need to copy here?
+    else:
+        return engine(
+            mapState=deepcopy(state.mapState),
+            sheepState=deepcopy(state.sheepState),
+            current_player=state.current_player,
+        )
+
+# ==============================================================================
+# ======================= workers of leaf parallelization ======================
+# ==============================================================================
+
+# forked workers must not share the random sequence of the main process
+def _seed_worker():
+    random.seed()
+    np.random.seed()
+
+# play "n" random games from a packed state, return the total points of each player
+def _simulate_leaf(data: bytes, engine, n: int) -> dict:
+    state = unpack_state(data, engine)
+    points = { p: 0 for p in range(1, GameMeta.PLAYERS+1) }
+
+    for _ in range(n):
+        records = []
+        for p, point in StoreTree.simulate(state, records).items():
+            points[p] += point
+        for record in reversed(records):
+            state.undo(record)
+
+    return points
+
+# ==============================================================================
+# ====================== search over an array based tree =======================
+# ==============================================================================
+
+class StoreTree:
+    # select / expand / backpropagate against a store.NodeStore, nodes are indices
+    # virtual loss is for parallel searches:
+    # every node on the path counts "virtual_loss" visits with 0 points until backpropagation
+    # table: if given, nodes of the same position share Q/N through the transposition table
+    #        while exploration still counts the visits of each node
+    # rng: random.Random of selection, expansion & rollouts, the random module if not given
+
+    def __init__(self, store: NodeStore, explore_weight=MCTSMeta.EXPLORE_WEIGHT, h_weight=MCTSMeta.H_WEIGHT, h_decay=MCTSMeta.H_DECAY, virtual_loss=0, lock=None, table: TranspositionTable=None, rng: random.Random=None):
+        self.store = store
         self.explore_weight = explore_weight
         self.h_weight = h_weight
         self.h_decay = h_decay
+        self.virtual_loss = virtual_loss
+        self.lock = lock # held while expanding if the store is shared
+        self.table = table
+        self.regions = None # RegionSimulator of rollouts, see simulate
+        self.rng = rng if rng is not None else random
+        self.node_cnt = 0
 
-    def add_children(self, children: list):
-        for child in children:
-            assert State.get_next_player(self.owner) == child.owner
-            self.children[child.move.hash] = child
+    def new_root(self, state: State) -> int:
+        root = self.store.allocate(1)
+        self.store.init_node(root, owner=state.current_player, plays=state.get_play_cnt(state.current_player), hash=state.hash)
+        return root
+
+    # return modified ucb values of the children of "index"
+    def get_values(self, index: int) -> np.ndarray:
+        store = self.store
+        first = store.first_child[index]
+        children = slice(first, first + store.child_count[index])
+        N = store.N[children]
+        unvisited = N == 0
+        N = np.maximum(N, 1)
+
+        # exploitation + exploration
+        # the parent's part of the exploration term is computed once for all children
+        explore = self.explore_weight * sqrt(log(max(store.N[index], 1)))
+        Q = store.Q[children]
+        if self.table:
+            # statistics of the position over all paths leading to it
+            entries = self.table.find(store.hash[children])
+            shared = entries != NONE
+            Q = np.where(shared, self.table.Q[entries] / np.maximum(self.table.N[entries], 1) * N, Q)
+        values = Q / N + explore / np.sqrt(N)
+
+        if self.h_weight:
+            H = store.H[children]
+            if self.h_decay:
+                # rely less on heuristics as gane goes on
+                H = H / np.sqrt(store.plays[children] + 1) # +1 to avoid zero division error
+            values += self.h_weight * H
 
-    # self.H (the heuristic) = number of valid moves at the moment
-    def set_H(self, state: State):
-        assert state.current_player == self.owner
+        # if not visited, set the value as infinity.
+        # Nodes with no visits are on priority
+        values[unvisited] = 0 if self.explore_weight == 0 else GameMeta.INF
+        return values
 
-        if self.h_weight and not self.H:
-            self.H = len(state.get_valid_moves())
+    # run simulations from "root" until the time is up or "stop" (a threading.Event) is set
+    # or until "iterations" iterations have run or "nodes" nodes have been added, if given
+    # return the number of simulations
+    def run(self, root: int, state: State, time_budget: float, stop=None, iterations: int=None, nodes: int=None) -> int:
+        start_time = clock()
+        state = self.copy_state(state) # scratch state, restored after each iteration
+        simulate_cnt = 0
+        iteration_cnt = 0
+        node_cnt = self.node_cnt
 
-    @property # calculate modified ucb value
-    def value(self):
-        # if not visited, set the value as infinity. 
-        # Nodes with no visits are on priority
-        if self.N == 0:
-            return 0 if self.explore_weight == 0 else GameMeta.INF
-        else:
-            # exploitation + exploration
-            ucb =  self.Q / self.N + self.explore_weight * sqrt(log(self.parent.N) / self.N)
+        while clock() - start_time < time_budget and not (stop and stop.is_set()):
+            if iterations is not None and iteration_cnt >= iterations:
+                break
+            if nodes is not None and self.node_cnt - node_cnt >= nodes:
+                break
+            iteration_cnt += 1
 
-            if self.h_weight == 0:
-                return ucb
-            elif not self.h_decay:
-                return ucb + self.h_weight * self.H
-            else:
-                # rely less on heuristics as gane goes on
-                return ucb + self.h_weight * self.H / sqrt(self.plays+1)  # +1 to avoid zero division error
+            records = []
+            node = self.select(root, state, records)
+            simulate_cnt += self.evaluate(node, state, records)
 
-class MCTS:
-    def __init__(self, state: State, explore_weight=MCTSMeta.EXPLORE_WEIGHT, h_weight=MCTSMeta.H_WEIGHT, h_decay=MCTSMeta.H_DECAY):
-        print("init mcts") # check if the global variable in test.py works
-        
-        self.explore_weight = explore_weight
-        self.h_weight = h_weight
-        self.h_decay = h_decay
+            # unwind the scratch state back to the root
+            self.restore(state, records)
 
-        self.node_cnt = 0
-        self.simulate_cnt = 0 # number of simulations
-        self.reset_cnt = 0    # number of resests due to unreached state
+        return simulate_cnt
 
-        self.root_state = deepcopy(state) # probably no need to copy here?
-        self.root = Node(
-            **self._get_meta_pack(),
-            owner=state.current_player, 
-            plays=0,
-        )
-        
+    @staticmethod
+    def copy_state(state: State) -> State:
+        return deepcopy(state)
 
-    def search(self, time_budget: float) -> None:
-        start_time = clock()
-        while clock() - start_time < time_budget:
-            node, state = self.select() # the selected state is deepcopied
-            self.simulate(state)        # random play until gameover
-            self.backpropagate(node, state.get_points())
-            self.simulate_cnt += 1
-        
-    def select(self) -> tuple:
-        node = self.root
-        state = deepcopy(self.root_state)
+    # undo the plays of "records" on "state"
+    @staticmethod
+    def restore(state: State, records: list):
+        for record in reversed(records):
+            state.undo(record)
+
+    # "state" must be at "root" and is played down to the selected node
+    # undo records of the plays are appended to "records"
+    def select(self, root: int, state: State, records: list) -> int:
+        store = self.store
+        node = root
+        store.N[node] += self.virtual_loss
 
         # stop if we find reach a leaf node
-        while len(node.children) != 0:
-            # descend to the maximum value node, break ties at random
-            children = node.children.values()
-            max_value = max(children, key=lambda n: n.value).value
-            max_nodes = [n for n in node.children.values() if n.value == max_value]
-            node = random.choice(max_nodes)
-            state.play(node.move)
+        while store.child_count[node] != 0:
+            # descend to the maximum value node
+            # children are shuffled on expansion, so taking the 1st maximum breaks ties at random
+            node = store.first_child[node] + int(np.argmax(self.get_values(node)))
+
+            unvisited = store.N[node] == 0
+            store.N[node] += self.virtual_loss
+            records.append(state.play(int(store.move[node])))
 
             # if some child node has not been explored select it before expanding others
-            if node.N == 0:
-                return node, state
+            if unvisited:
+                return node
 
         # if we reach a leaf node generate its children and return one of them
         # if the node is terminal, just return the terminal node
         if self.expand(node, state):
-            node = random.choice(list(node.children.values()))
-            state.play(node.move)
-        
-        return node, state
+            node = store.first_child[node] + self.rng.randrange(store.child_count[node])
+            store.N[node] += self.virtual_loss
+            records.append(state.play(int(store.move[node])))
+
+        return node
 
-    def expand(self, parent: Node, state: State) -> bool:
+    def expand(self, parent: int, state: State) -> bool:
         if state.gameover():
             # game is over nothing to expand
             return False
 
-        assert parent.owner == state.current_player
-
-        children = []
-        for move in state.get_valid_moves():
-            if self.h_weight != 0:
-                child_state = deepcopy(state)
-                child_state.play(move)
-
-                child = Node(
-                    **self._get_meta_pack(),
-                    owner=child_state.current_player,
-                    plays=state.get_play_cnt(child_state.current_player),
-                    move=move, 
-                    parent=parent,
-                )
-                
-                child.set_H(child_state) # set the heuristic value
-            else:
-                child = Node(
-                    **self._get_meta_pack(),
-                    owner=State.get_next_player(state.current_player),
-                    move=move, 
-                    parent=parent,
-                )
-
-            children.append(child)
+        # the heuristic of a child = number of valid moves at the moment
+        moves = state.get_valid_moves()
+        self.rng.shuffle(moves)
+        heuristics = state.count_moves_after(moves) if self.h_weight != 0 else []
 
-        parent.add_children(children)
-        self.node_cnt += len(children)
+        hashes = [state.get_hash_after(move) for move in moves] if self.table else []
 
-        return True
+        if self.lock:
+            self.lock.acquire()
 
+        try:
+            store = self.store
+            # expanded by another worker in the meantime
+            if store.child_count[parent] != 0:
+                return True
+
+            first = store.allocate(len(moves))
+            if first == NONE: # the store is full, treat the node as a leaf
+                return False
+
+            owner = State.get_next_player(state.current_player)
+            plays = state.get_play_cnt(owner)
+            for i, move in enumerate(moves):
+                store.init_node(first+i, owner=owner, move=move, parent=parent, plays=plays)
+            if heuristics:
+                store.H[first:first+len(moves)] = heuristics
+            if hashes:
+                store.hash[first:first+len(moves)] = hashes
+                if self.table:
+                    self.table.find(store.hash[first:first+len(moves)], count=True)
+
+            # children become visible to other workers once they are initialized
+            store.first_child[parent] = first
+            store.child_count[parent] = len(moves)
+            self.node_cnt += len(moves)
+            return True
+        finally:
+            if self.lock:
+                self.lock.release()
+
+    # simulate from the selected node and backpropagate, return the number of simulations
+    def evaluate(self, node: int, state: State, records: list) -> int:
+        points = self.simulate(state, records, regions=self.regions, rng=self.rng) # random play until the rankings are decided
+        self.backpropagate(node, points)
+        return 1
+
+    # return the points of the random game
+    # cutoff: after a player is frozen, stop every "cutoff" plies if the rankings are decided
+    # regions: a regions.RegionSimulator to finish the game region by region once the free area splits,
+    #          tried every MCTSMeta.REGION_PLIES plies after a player is frozen
+    # rng: the random module or a random.Random instance
     @staticmethod
-    def simulate(state: State):
+    def simulate(state: State, records: list, cutoff=MCTSMeta.CUTOFF_PLIES, regions: RegionSimulator=None, rng=random) -> dict:
+        frozen = False # some player can no longer move
+        plies = 0
         while not state.gameover():
-            valid_moves = state.get_valid_moves()
-            state.play(random.choice(valid_moves))
-
-    @staticmethod
-    def backpropagate(node: Node, points: list):
+            # once a player is frozen, players who cannot move are skipped without drawing a STAY
+            if frozen:
+                record = state.fast_forward()
+                if record:
+                    records.append(record)
+
+                plies += 1
+                if cutoff and plies % cutoff == 0:
+                    points = state.get_decided_points()
+                    if points:
+                        return points
+
+                # the regions are filled in, the loop only passes the remaining turns until gameover
+                if regions and plies % MCTSMeta.REGION_PLIES == 0 and regions.simulate(state, records, rng):
+                    continue
+
+            move = state.get_random_move(rng)
+            frozen = frozen or move == STAY
+            records.append(state.play(move))
+
+        return state.get_points()
+
+    # points: total points of "visits" games
+    def backpropagate(self, node: int, points: dict, visits=1):
         # Caution! Q should += player who just played (parent.owner)
         # not who is going to play (node.owners)
+        store = self.store
+
+        path = []
+        while node != NONE:
+            store.N[node] += visits - self.virtual_loss
+            parent = store.parent[node]
+            if parent != NONE:
+                store.Q[node] += points[int(store.owner[parent])]
+                path.append(node)
+            node = parent
+
+        if self.table and path:
+            self.table.update(store.hash[path], visits, [points[int(store.owner[store.parent[n]])] for n in path])
+
+    # add "visits" to N of "node" and all its ancestors
+    def _add_visits(self, node: int, visits):
+        while node != NONE:
+            self.store.N[node] += visits
+            node = self.store.parent[node]
+
+# ==============================================================================
+# ==================================== MCTS ====================================
+# ==============================================================================
+
+class MCTS(StoreTree):
+    # engine: class of the game state used by the search (State or BitState)
+    # batch_size: if > 1, every selected leaf is evaluated by batch_size games played with NumPy
+    # leaf_workers: if > 0, every selected leaf is evaluated by leaf_simulations games
+    #               in a pool of leaf_workers processes while the search goes on
+    #               the pool lives until "close", and under "spawn" (Windows) its processes import
+    #               the driver again, which must run its client under a main guard (see Sample.py)
+    # capacity: initial number of nodes of the store, which grows when needed
+    # table_capacity: entries of the transposition table, 0 to search without it
+    # solver_cells: solve the endgame exactly once at most solver_cells free cells are reachable
+    # regions: finish rollouts region by region once the free area splits (see regions.py)
+    # seed: if given, the search draws from its own random generators seeded with it,
+    #       so that searches with an iteration or node budget are reproducible (see search)
+    # profile_log: if given, time the phases of the search and append a JSON line per turn to this file
+    def __init__(self, state: State, explore_weight=MCTSMeta.EXPLORE_WEIGHT, h_weight=MCTSMeta.H_WEIGHT, h_decay=MCTSMeta.H_DECAY, engine=State, batch_size=MCTSMeta.BATCH_SIZE,
+                 leaf_workers=0, leaf_simulations=MCTSMeta.LEAF_SIMULATIONS, virtual_loss=MCTSMeta.VIRTUAL_LOSS, capacity=MCTSMeta.STORE_CAPACITY,
+                 table_capacity=MCTSMeta.TABLE_CAPACITY, solver_cells=MCTSMeta.SOLVER_FREE_CELLS, regions=MCTSMeta.REGION_ROLLOUTS, seed: int=None,
+                 profile_log=MCTSMeta.PROFILE_LOG):
+        print("init mcts") # check if the global variable in test.py works
+
+        super().__init__(
+            NodeStore(capacity, growable=True),
+            explore_weight=explore_weight,
+            h_weight=h_weight,
+            h_decay=h_decay,
+            virtual_loss=(virtual_loss if leaf_workers > 0 else 0),
+            table=(TranspositionTable(table_capacity) if table_capacity > 0 else None),
+            rng=(random.Random(seed) if seed is not None else None),
+        )
+
+        self.simulate_cnt = 0 # number of simulations
+        self.ponder_cnt = 0   # number of simulations of the last pondering
+        self.reset_cnt = 0    # number of resests due to unreached state
+        self.retained_cnt = 0 # number of nodes kept by the last "move_to"
+
+        self.root_state = to_engine(state, engine)
+        self.root = self.new_root(self.root_state)
+
+        self.batch_size = batch_size
+        self.batch_simulator = BatchSimulator(self.root_state.geometry, np.random.default_rng(seed)) if batch_size > 1 else None
+
+        self.engine = type(self.root_state)
+        self.leaf_workers = leaf_workers
+        self.leaf_simulations = leaf_simulations
+        self.pool = ProcessPoolExecutor(max_workers=leaf_workers, initializer=_seed_worker) if leaf_workers > 0 else None
+
+        self.solver_cells = solver_cells
+        self.solver = EndgameSolver() if solver_cells > 0 else None
+        self.solved_move = None # best move of the root if the solver finished
+
+        if regions:
+            self.regions = RegionSimulator()
+
+        self.profiler = None
+        if profile_log:
+            self.profiler = SearchProfiler(profile_log)
+            self.profiler.attach(self)
+            if self.batch_simulator:
+                self.profiler.attach_batch(self.batch_simulator)
+            self.profiled_cnt = 0 # simulations before the last line of the profile
+
+    # search for "time_budget" seconds, "iterations" iterations or until "nodes" nodes are added,
+    # whichever comes first
+    # without a time budget the result only depends on the seed, the solver (bounded by time)
+    # is not used then and leaf parallel search does not support it
+    # timer: if given, the search stops early once the best move is decided (see timing.py)
+    def search(self, time_budget: float=None, timer: TimeManager=None, iterations: int=None, nodes: int=None) -> None:
+        assert time_budget is not None or iterations is not None or nodes is not None, "no budget"
+        assert time_budget is not None or not (self.pool or timer), "leaf parallel search & timer need a time budget"
+        start_time = clock()
+
+        # the hit rate of the table is counted per turn
+        # and the statistics are aged once per own turn, not per move of every player
+        if self.table:
+            self.table.reset_stats()
+            self.table.age()
+
+        moves = self.root_state.get_valid_moves()
+        if len(moves) == 1:
+            # nothing to choose (e.g. STAY once frozen)
+            self.solved_move = moves[0]
+        elif time_budget is not None and self._can_solve():
+            try:
+                self.solved_move, points = self.solver.solve(self.root_state, time_budget * MCTSMeta.SOLVER_TIME)
+                print(f"solved: {points}, {self.solver.nodes} nodes, {self.solver.nodes_per_sec:.0f} nodes/s")
+            except SolverTimeout:
+                print(f"solver timeout: {self.solver.nodes} nodes, {self.solver.nodes_per_sec:.0f} nodes/s")
+
+        if time_budget is None:
+            time_budget = GameMeta.INF
+        if self.solved_move is None:
+            self._search(time_budget - (clock() - start_time), timer=timer, iterations=iterations, nodes=nodes)
+
+        if timer:
+            timer.end_search(time_budget, clock() - start_time)
+
+        if self.profiler:
+            self.profiler.write(
+                search_time=clock() - start_time,
+                simulations=self.simulate_cnt - self.profiled_cnt, # including pondering
+                ponder_simulations=self.ponder_cnt,
+                nodes=self.store.size,
+                retained=self.retained_cnt,
+                root_children=int(self.store.child_count[self.root]),
+                solved=self.solved_move is not None,
+                **({"table_hit_rate": self.table.hit_rate, "table_evictions": self.table.evictions} if self.table else {}),
+            )
+            self.profiled_cnt = self.simulate_cnt
+
+    # keep searching while the opponents think, until "stop" (a threading.Event) is set
+    # the statistics stay in the tree and are reused after "move_to" the opponents' moves
+    def ponder(self, stop, time_budget=GameMeta.TIME_LIMIT * (GameMeta.PLAYERS-1)) -> None:
+        simulate_cnt = self.simulate_cnt
+        if not self.root_state.gameover():
+            self._search(time_budget, stop)
+        self.ponder_cnt = self.simulate_cnt - simulate_cnt
+
+    def _search(self, time_budget: float, stop=None, timer: TimeManager=None, iterations: int=None, nodes: int=None) -> None:
+        if self.pool:
+            self._search_leaf_parallel(time_budget, stop)
+        elif timer:
+            self._search_timed(time_budget, timer)
+        else:
+            self.simulate_cnt += self.run(self.root, self.root_state, time_budget, stop, iterations, nodes)
+
+    # search in slices of MCTSMeta.TIME_CHECK seconds until the best move is decided
+    # the simulations still to come are estimated by the rate of the search so far
+    def _search_timed(self, time_budget: float, timer: TimeManager) -> None:
+        start_time = clock()
+        simulate_cnt = 0
 
-        while node:
-            node.N += 1
-            if node.parent:
-                node.Q += points[node.parent.owner]
-            # ============= for debug purposes, delete before submission =============
-            if node.parent:
-                assert State.get_next_player(node.parent.owner) == node.owner
-            # ========================================================================
-            node = node.parent
+        while clock() - start_time < time_budget:
+            remaining = time_budget - (clock() - start_time)
+            simulate_cnt += self.run(self.root, self.root_state, min(remaining, MCTSMeta.TIME_CHECK))
+
+            elapsed = clock() - start_time
+            first = self.store.first_child[self.root]
+            N = self.store.N[first:first + self.store.child_count[self.root]]
+            if timer.is_decided(N, simulate_cnt / elapsed * (time_budget - elapsed)):
+                break
+
+        self.simulate_cnt += simulate_cnt
+
+    def evaluate(self, node: int, state: State, records: list) -> int:
+        if self.batch_simulator and self._all_placed(state):
+            points = self.batch_simulator.simulate(state, self.batch_size).sum(axis=0)
+            points = { p: points[p-1] for p in range(1, GameMeta.PLAYERS+1) }
+            self.backpropagate(node, points, self.batch_size)
+            return self.batch_size
+        else:
+            return super().evaluate(node, state, records)
 
-    def get_best_move(self) -> Move:
-        assert self.root_state.current_player == self.root.owner
+    # leaves are evaluated by the process pool while further leaves are selected
+    # nodes on the path to a leaf in flight carry virtual loss so that other leaves get selected
+    def _search_leaf_parallel(self, time_budget: float, stop=None) -> None:
+        start_time = clock()
+        state = deepcopy(self.root_state)
+        pending = {} # future -> selected node
+        max_pending = 2 * self.leaf_workers
+
+        while clock() - start_time < time_budget and not (stop and stop.is_set()):
+            if len(pending) < max_pending:
+                records = []
+                node = self.select(self.root, state, records)
+
+                if state.gameover():
+                    self.backpropagate(node, state.get_points())
+                    self.simulate_cnt += 1
+                else:
+                    future = self.pool.submit(_simulate_leaf, pack_state(state), self.engine, self.leaf_simulations)
+                    pending[future] = node
+
+                for record in reversed(records):
+                    state.undo(record)
+            else:
+                wait(pending, timeout=time_budget - (clock() - start_time), return_when=FIRST_COMPLETED)
+
+            for future in [f for f in pending if f.done()]:
+                node = pending.pop(future)
+                self.backpropagate(node, future.result(), self.leaf_simulations)
+                self.simulate_cnt += self.leaf_simulations
+
+        # results still in flight are dropped, not waited for
+        for node in pending.values():
+            self._add_visits(node, -self.virtual_loss)
+
+    def close(self):
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+        if self.profiler:
+            self.profiler.close()
+
+    def get_best_move(self) -> int:
+        assert self.root_state.current_player == self.store.owner[self.root]
 
         if self.root_state.gameover():
             return None
 
-        # choose the move of the most simulated node breaking ties randomly
-        max_value = max(self.root.children.values(), key=lambda n: n.N).N
-        max_nodes = [n for n in self.root.children.values() if n.N == max_value]
-        bestchild = random.choice(max_nodes)
-        return bestchild.move
+        if self.solved_move is not None:
+            return self.solved_move
 
-    def move_to(self, move: Move, msg: str=""):
-        assert self.root_state.current_player == self.root.owner
+        # a search without time left (see timing.py) may not have expanded the root
+        if self.store.child_count[self.root] == 0:
+            self.expand(self.root, self.root_state)
 
-        try:
-            p_before_play = self.root_state.current_player
+        # choose the move of the most simulated node breaking ties randomly
+        first = self.store.first_child[self.root]
+        N = self.store.N[first:first + self.store.child_count[self.root]]
+        max_nodes = np.flatnonzero(N == N.max())
+        return int(self.store.move[first + self.rng.choice(max_nodes)])
+
+    def move_to(self, move: int, msg: str=""):
+        assert self.root_state.current_player == self.store.owner[self.root]
+
+        solved = move == self.solved_move
+        self.solved_move = None
+        child = self.store.find_child(self.root, move)
+
+        assert child != NONE or msg != "best move" or solved
+
+        # the root has not been expanded (no search since the last move, the solver answered
+        # or the game is over) or the child was never visited (a search without time left),
+        # so there is no subtree to keep: reset "root_state" and "root"
+        # with a transposition table, the children of the new root get the statistics
+        # of their positions back from the table (see get_values)
+        if child == NONE or self.store.N[child] == 0:
+            self._reset(move)
+            return
 
-            child = self.root.children[move.hash]
-            child.parent = None
-            self.root = child
-            self.root_state.play(child.move)
+        self.root_state.play(move)
 
-            if p_before_play == self.root_state.current_player:
-                print("turn not changing")
-                raise ValueError()
+        # only the subtree of the new root is kept
+        self.store = self.store.extract(child)
+        self.root = 0
+        self.retained_cnt = self.store.size
 
-            return
-            
-        # it is possible that mcts has not reached "move"
-        # in this case, reset "root_state" and "root" 
-        except KeyError:
-            assert msg != "best move"
-            self._reset(move)
+    # the root is an endgame small enough for the solver
+    def _can_solve(self) -> bool:
+        if not self.solver or not self._all_placed(self.root_state) or self.root_state.gameover():
+            return False
+        return self.root_state.count_reachable_free() <= self.solver_cells
 
-    def _get_meta_pack(self) -> dict:
-        return {
-            "explore_weight": self.explore_weight,
-            "h_weight": self.h_weight,
-            "h_decay": self.h_decay,
-        }
+    # batch games can only start after every player has set the 1st piece
+    @staticmethod
+    def _all_placed(state: State) -> bool:
+        return all(state.get_play_cnt(p) for p in range(1, GameMeta.PLAYERS+1))
 
-    def _reset(self, move: Move):
+    def _reset(self, move: int):
         self.root_state.play(move)
-        self.root = Node(
-            **self._get_meta_pack(),
-            owner=self.root_state.current_player, 
-            plays=self.root_state.get_play_cnt(self.root_state.current_player),
-        )
+        self.store.clear()
+        self.root = self.new_root(self.root_state)
         self.reset_cnt += 1
-        
\ No newline at end of file
+        self.retained_cnt = 0
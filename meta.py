@@ -1,7 +1,28 @@
 class MCTSMeta:
     EXPLORE_WEIGHT = 2.0 # for ucb exploration
-    H_WEIGHT = 0       # for heuristic
+    H_WEIGHT = 0       # for heuristic (agent.py, which is frozen, plays with 0.1)
     H_DECAY = True       # gradually reduce weight of heuristic as game goes on
+    BATCH_SIZE = 0       # games per leaf played with NumPy, 0 to play 1 game in python
+    WORKERS = 1          # processes of parallel search, 1 to search in this process
+    TREE_CAPACITY = 1 << 20 # nodes of the shared tree of tree parallel search
+    VIRTUAL_LOSS = 1     # visits added to nodes on the path of an ongoing simulation
+    LEAF_SIMULATIONS = 8 # games per leaf of leaf parallel search
+    STORE_CAPACITY = 1 << 16 # initial nodes of the MCTS store, grows when needed
+    CUTOFF_PLIES = 0     # plies between checks whether the rankings of a rollout are decided, 0 to disable
+    SOLVER_FREE_CELLS = 12 # solve exactly if at most this many free cells are reachable, 0 to disable
+    SOLVER_TIME = 0.5    # fraction of the time budget for the solver before falling back to MCTS
+    SOLVER_CACHE_SIZE = 1 << 20 # positions cached by the solver across turns
+    REGION_ROLLOUTS = False # finish rollouts region by region once the free area splits
+    REGION_PLIES = 8     # plies between checks whether the free area has split
+    REGION_SAMPLES = 4   # fill-ins cached per region signature
+    REGION_CACHE_SIZE = 1 << 16 # region signatures cached
+    PONDER = True        # keep searching while the opponents think
+    TIME_MARGIN = 0.25   # seconds of each turn kept for the round trip to the server
+    TIME_CHECK = 0.1     # seconds between checks whether the best move is decided
+    GC_CONTROL = True    # collect garbage between turns instead of during them
+    OVERHEAD_DECAY = 0.5 # per turn decay of the time after the search kept off the budget
+    PROFILE_LOG = ""     # file of the per turn JSON profile of the search, empty to disable
+    TABLE_CAPACITY = 0   # entries of the transposition table (power of 2), 0 to disable
 
 
 class GameMeta:
@@ -0,0 +1,225 @@
+from copy import deepcopy
+import multiprocessing as mp
+import random
+from time import time as clock
+import numpy as np
+from meta import MCTSMeta
+from state import State
+from mcts import MCTS, StoreTree, to_engine
+from store import SharedNodeStore, NONE
+from timing import TimeManager
+
+# ==============================================================================
+# ============================ root parallelization ============================
+# ==============================================================================
+
+# a worker keeps its own tree across turns
+# commands: ("search", time_budget) -> ({move: (N, Q)} of root children, simulate_cnt, solved move or None)
+#           ("move", move)          -> play the move on the tree (no reply)
+#           ("close", None)
+def _root_worker(conn, state: State, seed: int, mcts_args: dict):
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    agent = MCTS(state, **mcts_args)
+
+    while True:
+        command, arg = conn.recv()
+        if command == "search":
+            agent.search(time_budget=arg)
+            store = agent.store
+            first = store.first_child[agent.root]
+            children = range(first, first + store.child_count[agent.root])
+            stats = { int(store.move[c]): (int(store.N[c]), float(store.Q[c])) for c in children }
+            # the root is not expanded if the solver or a single valid move answered
+            conn.send((stats, agent.simulate_cnt, agent.solved_move))
+        elif command == "move":
+            # the chosen move may be unexplored by this worker, never "best move" here
+            agent.move_to(arg, msg="update")
+        elif command == "close":
+            break
+
+    conn.close()
+
+class RootParallelMCTS:
+    # "workers" processes build their own trees from the same state with different seeds
+    # root children statistics are merged by move to choose the best move
+    # same interface as MCTS for the driver: search, get_best_move, move_to, root_state
+    def __init__(self, state: State, workers=MCTSMeta.WORKERS, seed=None, **mcts_args):
+        self.root_state = deepcopy(state)
+        self.stats = {}       # merged {move: [N, Q]} of the last search
+        self.solved_move = None # move of the last search answered by a worker without statistics
+        self.simulate_cnt = 0 # of all workers
+
+        if seed is None:
+            seed = random.randrange(2**32)
+
+        self.conns = []
+        self.processes = []
+        for i in range(workers):
+            conn, worker_conn = mp.Pipe()
+            process = mp.Process(
+                target=_root_worker,
+                args=(worker_conn, self.root_state, seed+i, mcts_args),
+                daemon=True,
+            )
+            process.start()
+            worker_conn.close()
+
+            self.conns.append(conn)
+            self.processes.append(process)
+
+    # timer: the workers search for the whole budget, the timer only learns when the search ended
+    def search(self, time_budget: float, timer: TimeManager=None) -> None:
+        start_time = clock()
+        for conn in self.conns:
+            conn.send(("search", time_budget))
+
+        self.stats = {}
+        self.simulate_cnt = 0
+        self.solved_move = None
+        for conn in self.conns:
+            stats, simulate_cnt, solved_move = conn.recv()
+            self.simulate_cnt += simulate_cnt
+            if solved_move is not None:
+                self.solved_move = solved_move
+            for move, (N, Q) in stats.items():
+                merged = self.stats.setdefault(move, [0, 0])
+                merged[0] += N
+                merged[1] += Q
+
+        if timer:
+            timer.end_search(time_budget, clock() - start_time)
+
+    def get_best_move(self) -> int:
+        if self.root_state.gameover():
+            return None
+
+        # the solver is exact, so its move is taken over the statistics of the other workers
+        if self.solved_move is not None:
+            return self.solved_move
+
+        # a search without time left leaves no statistics
+        if not self.stats:
+            return random.choice(self.root_state.get_valid_moves())
+
+        # choose the most simulated move over all trees breaking ties by Q/N, then randomly
+        key = lambda move: (self.stats[move][0], self.stats[move][1] / max(self.stats[move][0], 1))
+        max_value = max(key(move) for move in self.stats)
+        max_moves = [move for move in self.stats if key(move) == max_value]
+        return random.choice(max_moves)
+
+    def move_to(self, move: int, msg: str=""):
+        self.root_state.play(move)
+        for conn in self.conns:
+            conn.send(("move", move))
+
+    def close(self):
+        for conn in self.conns:
+            conn.send(("close", None))
+            conn.close()
+        for process in self.processes:
+            process.join()
+
+# ==============================================================================
+# ============================ tree parallelization ============================
+# ==============================================================================
+
+# all workers search the same tree in shared memory
+# commands: ("search", (time_budget, root, state)) -> number of simulations
+#           ("close", None)
+def _tree_worker(conn, store: SharedNodeStore, seed: int, tree_args: dict):
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    tree = StoreTree(store, lock=store.lock, **tree_args)
+
+    while True:
+        command, arg = conn.recv()
+        if command == "search":
+            time_budget, root, state = arg
+            conn.send(tree.run(root, state, time_budget))
+        elif command == "close":
+            break
+
+    store.close()
+    conn.close()
+
+class TreeParallelMCTS:
+    # "workers" processes search one tree kept in a SharedNodeStore
+    # virtual loss keeps workers from descending into the same path
+    # same interface as MCTS for the driver: search, get_best_move, move_to, root_state
+    def __init__(self, state: State, workers=MCTSMeta.WORKERS, capacity=MCTSMeta.TREE_CAPACITY, virtual_loss=MCTSMeta.VIRTUAL_LOSS, seed=None, engine=State, **tree_args):
+        self.root_state = to_engine(state, engine)
+        self.simulate_cnt = 0
+        self.reset_cnt = 0 # number of resets due to unreached state or a full store
+
+        self.store = SharedNodeStore(capacity, mp.Lock())
+        tree_args["virtual_loss"] = virtual_loss
+        self.tree = StoreTree(self.store, lock=self.store.lock, **tree_args)
+        self.root = self.tree.new_root(self.root_state)
+
+        if seed is None:
+            seed = random.randrange(2**32)
+
+        self.conns = []
+        self.processes = []
+        for i in range(workers):
+            conn, worker_conn = mp.Pipe()
+            process = mp.Process(
+                target=_tree_worker,
+                args=(worker_conn, self.store, seed+i, tree_args),
+                daemon=True,
+            )
+            process.start()
+            worker_conn.close()
+
+            self.conns.append(conn)
+            self.processes.append(process)
+
+    # timer: see RootParallelMCTS.search
+    def search(self, time_budget: float, timer: TimeManager=None) -> None:
+        start_time = clock()
+        for conn in self.conns:
+            conn.send(("search", (time_budget, self.root, self.root_state)))
+        for conn in self.conns:
+            self.simulate_cnt += conn.recv()
+
+        if timer:
+            timer.end_search(time_budget, clock() - start_time)
+
+    def get_best_move(self) -> int:
+        if self.root_state.gameover():
+            return None
+
+        # a search without time left may not have expanded the root, nor the full store afterwards
+        if self.store.child_count[self.root] == 0 and not self.tree.expand(self.root, self.root_state):
+            return random.choice(self.root_state.get_valid_moves())
+
+        # choose the move of the most simulated node breaking ties randomly
+        first = self.store.first_child[self.root]
+        N = self.store.N[first:first + self.store.child_count[self.root]]
+        max_nodes = np.flatnonzero(N == N.max())
+        return int(self.store.move[first + random.choice(max_nodes)])
+
+    def move_to(self, move: int, msg: str=""):
+        child = self.store.find_child(self.root, move)
+        self.root_state.play(move)
+
+        # nodes above the root are never reused, so the store only fills up over the game
+        if child == NONE or self.store.N[child] == 0 or self.store.size > self.store.capacity * 0.9:
+            self._reset()
+        else:
+            self.root = child
+            self.store.parent[child] = NONE
+
+    def _reset(self):
+        self.store.clear()
+        self.root = self.tree.new_root(self.root_state)
+        self.reset_cnt += 1
+
+    def close(self):
+        for conn in self.conns:
+            conn.send(("close", None))
+            conn.close()
+        for process in self.processes:
+            process.join()
+        self.store.close()
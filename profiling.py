@@ -0,0 +1,98 @@
+import json
+from time import perf_counter as clock
+
+PHASES = ["select", "copy", "expand", "simulate", "backpropagate", "restore"]
+
+class SearchProfiler:
+    # wall time & calls of the phases of the search, written as one JSON line per turn
+    # the methods of a tree are replaced by timed wrappers on its instance (see attach),
+    # so a tree without a profiler runs the plain methods at no cost
+    # times are exclusive: "select" does not include the "expand" it calls
+
+    def __init__(self, path: str):
+        self.file = open(path, "a")
+        self.turn = 0
+        self.reset()
+
+    def reset(self):
+        self.time = { phase: 0.0 for phase in PHASES }
+        self.calls = { phase: 0 for phase in PHASES }
+        self.rollouts = 0      # games played by "simulate", a batch counts all of its games
+        self.rollout_plies = 0 # plies of all rollouts
+        self.depth_sum = 0     # depth of all selected nodes
+        self.max_depth = 0
+        self._inner = 0.0      # time of the timed calls nested in the current one
+
+    def close(self):
+        self.file.close()
+
+    # time the phases of "tree" (a mcts.StoreTree)
+    def attach(self, tree):
+        tree.select = self._count_depth(self.wrap("select", tree.select))
+        tree.copy_state = self.wrap("copy", tree.copy_state)
+        tree.expand = self.wrap("expand", tree.expand)
+        tree.simulate = self._count_plies(self.wrap("simulate", tree.simulate))
+        tree.backpropagate = self.wrap("backpropagate", tree.backpropagate)
+        tree.restore = self.wrap("restore", tree.restore)
+
+    # time the games of "simulator" (a batch.BatchSimulator) as "simulate"
+    def attach_batch(self, simulator):
+        simulate = self.wrap("simulate", simulator.simulate)
+        def counted(state, n):
+            points = simulate(state, n)
+            self.rollouts += n
+            self.rollout_plies += simulator.plies
+            return points
+        simulator.simulate = counted
+
+    def wrap(self, phase: str, fn):
+        def timed(*args, **kwargs):
+            outer = self._inner
+            self._inner = 0.0
+            start = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                self.time[phase] += elapsed - self._inner
+                self.calls[phase] += 1
+                self._inner = outer + elapsed
+        return timed
+
+    # select(root, state, records) appends a record per ply down to the selected node
+    def _count_depth(self, select):
+        def counted(root, state, records):
+            node = select(root, state, records)
+            self.depth_sum += len(records)
+            self.max_depth = max(self.max_depth, len(records))
+            return node
+        return counted
+
+    # simulate(state, records, ...) appends a record per ply of the rollout
+    def _count_plies(self, simulate):
+        def counted(state, records, *args, **kwargs):
+            start = len(records)
+            points = simulate(state, records, *args, **kwargs)
+            self.rollouts += 1
+            self.rollout_plies += len(records) - start
+            return points
+        return counted
+
+    # write the statistics since the last call as a JSON line and start over
+    # "stats": further fields of the line
+    def write(self, **stats):
+        selects = self.calls["select"]
+        line = {
+            "turn": self.turn,
+            "time": { phase: round(t, 6) for phase, t in self.time.items() },
+            "calls": self.calls,
+            "rollout_length": self.rollout_plies / max(self.rollouts, 1),
+            "mean_depth": self.depth_sum / max(selects, 1),
+            "max_depth": self.max_depth,
+            **stats,
+        }
+        self.file.write(json.dumps(line) + "\n")
+        self.file.flush()
+
+        self.turn += 1
+        self.reset()
@@ -0,0 +1,85 @@
+import random
+from meta import GameMeta, MCTSMeta
+from state import STAY, decode_move
+
+# group free regions which share a stack, since its sheep can go to either of them
+# return a list of (cell indices, {stack index: (owner, sheep)}) of every group next to some stack
+def get_independent_regions(regions: list, stacks: dict) -> list:
+    parent = list(range(len(regions)))
+    def find(r):
+        while parent[r] != r:
+            r = parent[r]
+        return r
+
+    for _, _, adjacent in stacks.values():
+        adjacent = list(adjacent)
+        for r in adjacent[1:]:
+            parent[find(r)] = find(adjacent[0])
+
+    groups = {}
+    for index, (owner, sheep, adjacent) in stacks.items():
+        group = groups.setdefault(find(next(iter(adjacent))), ([], {}))
+        group[1][index] = (owner, sheep)
+    for r, cells in enumerate(regions):
+        if find(r) in groups:
+            groups[find(r)][0].extend(cells)
+
+    return [(tuple(sorted(cells)), stacks) for cells, stacks in groups.values()]
+
+class RegionSimulator:
+    # finish a rollout by filling in every independent group of free regions separately
+    # once the free area has split, moves in one group never change what is possible in another
+    # fill-ins are cached by the signature of the group (cells, stacks next to them & player to move)
+    # and replayed, up to "samples" different fill-ins are kept per signature
+    # players take turns within a group, so the interleaving of moves across groups differs
+    # from a plain rollout, which is fine for a random playout
+
+    def __init__(self, samples=MCTSMeta.REGION_SAMPLES, cache_size=MCTSMeta.REGION_CACHE_SIZE):
+        self.samples = samples
+        self.cache = {} # signature -> list of move sequences
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+
+    # play the rest of the game into "state" if the free area has split into independent groups
+    # return False (without playing) if it has not
+    # rng: the random module or a random.Random instance
+    def simulate(self, state, records: list, rng=random) -> bool:
+        groups = get_independent_regions(*state.get_free_regions())
+        if len(groups) < 2:
+            return False
+
+        if len(self.cache) > self.cache_size:
+            self.cache.clear()
+
+        for cells, stacks in groups:
+            signature = (cells, tuple(sorted(stacks.items())), state.current_player)
+            fills = self.cache.setdefault(signature, [])
+            if len(fills) >= self.samples:
+                self.hits += 1
+                for move in rng.choice(fills):
+                    records.append(state.play(move))
+            else:
+                self.misses += 1
+                fills.append(self._fill(state, set(cells), set(stacks), records, rng))
+
+        return True
+
+    # play random moves within a group until nobody can move there, return the moves
+    def _fill(self, state, cells: set, stacks: set, records: list, rng=random) -> list:
+        moves = []
+        passes = 0 # consecutive players without a move in the group
+        while passes < GameMeta.PLAYERS:
+            # new stacks of the group are on its cells
+            candidates = [move for move in state.get_valid_moves() if move != STAY and (decode_move(move)[0] in stacks or decode_move(move)[0] in cells)]
+            if candidates:
+                move = rng.choice(candidates)
+                passes = 0
+            else:
+                move = STAY
+                passes += 1
+
+            records.append(state.play(move))
+            moves.append(move)
+
+        return moves
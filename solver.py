@@ -0,0 +1,83 @@
+from copy import deepcopy
+from time import time as clock
+from meta import GameMeta, MCTSMeta
+
+class SolverTimeout(Exception):
+    pass
+
+class EndgameSolver:
+    # exact max-n search over State / BitState for positions with few free cells left
+    # every player maximizes its own points of get_points, so the value of a node is the
+    # points vector (index p-1 for player p) of the child that is best for the player to move
+    #   - transposition cache: values & best moves by Zobrist hash, kept across turns
+    #   - move ordering: by history, how often a move was the best one so far
+    #   - immediate pruning: stop at a child giving the player to move the max reward
+    # (shallow pruning needs a constant sum of points, which ties break here)
+
+    def __init__(self, cache_size=MCTSMeta.SOLVER_CACHE_SIZE):
+        self.cache = {} # hash -> (points, best move)
+        self.cache_size = cache_size
+        self.history = {} # move -> times it was the best move
+        self.max_reward = max(GameMeta.REWARDS)
+
+        self.nodes = 0     # nodes searched by the last "solve"
+        self.elapsed = 0.0 # seconds of the last "solve"
+
+    @property
+    def nodes_per_sec(self) -> float:
+        return self.nodes / self.elapsed if self.elapsed else 0.0
+
+    # return (best move, points) of "state" for the player to move, the game must not be over
+    # raise SolverTimeout if the search does not finish in "time_budget" seconds
+    def solve(self, state, time_budget: float) -> tuple:
+        if len(self.cache) > self.cache_size:
+            self.cache.clear()
+
+        start = clock()
+        self.deadline = start + time_budget
+        self.nodes = 0
+        state = deepcopy(state) # a timeout leaves the state in the middle of the search
+        try:
+            points = self._search(state)
+        finally:
+            self.elapsed = clock() - start
+
+        return self.cache[state.hash][1], points
+
+    def _search(self, state) -> tuple:
+        self.nodes += 1
+        if self.nodes & 1023 == 0 and clock() > self.deadline:
+            raise SolverTimeout()
+
+        cached = self.cache.get(state.hash)
+        if cached:
+            return cached[0]
+
+        if state.gameover():
+            points = state.get_points()
+            return tuple(points[p] for p in range(1, GameMeta.PLAYERS+1))
+
+        player = state.current_player
+        moves = self._order(state.get_valid_moves())
+
+        best_points = None
+        best_move = None
+        for move in moves:
+            record = state.play(move)
+            points = self._search(state)
+            state.undo(record)
+
+            if best_points is None or points[player-1] > best_points[player-1]:
+                best_points = points
+                best_move = move
+                if points[player-1] >= self.max_reward:
+                    break
+
+        self.history[best_move] = self.history.get(best_move, 0) + 1
+        self.cache[state.hash] = (best_points, best_move)
+        return best_points
+
+    def _order(self, moves: list) -> list:
+        if len(moves) < 2:
+            return moves
+        return sorted(moves, key=lambda move: -self.history.get(move, 0))
@@ -1,6 +1,43 @@
 from meta import GameMeta
-from utils import get_direction_pattern, out_of_bound, get_neighbor
-from group import Group
+from geometry import Geometry, to_index, CELLS, COORDS, OFF
+from zobrist import CELL_KEYS, PLAYER_KEYS, get_hash
+import numpy as np
+import random
+
+# moves are packed into ints: (cell index << 7) | (sheep << 3) | direction
+# an init move has sheep = direction = 0, and STAY is reserved for not moving
+STAY = -1
+
+def encode_move(index: int, sheep: int, dir: int) -> int:
+    return (index << 7) | (sheep << 3) | dir
+
+def encode_init(index: int) -> int:
+    return index << 7
+
+# return (cell index, sheep, direction) of a move other than STAY
+def decode_move(code: int) -> tuple:
+    return (code >> 7, (code >> 3) & 15, code & 7)
+
+def is_init(code: int) -> bool:
+    return code >= 0 and code & 127 == 0
+
+# serialize a State (or BitState) as bytes: current player, map tokens, sheep
+def pack_state(state) -> bytes:
+    return (
+        bytes([state.current_player])
+        + np.asarray(state.mapState, dtype=np.int8).tobytes()
+        + np.asarray(state.sheepState, dtype=np.int8).tobytes()
+    )
+
+def unpack_state(data: bytes, engine=None):
+    size = (GameMeta.BOARD_SIZE, GameMeta.BOARD_SIZE)
+    cells = GameMeta.BOARD_SIZE * GameMeta.BOARD_SIZE
+    engine = engine or State
+    return engine(
+        mapState=np.frombuffer(data, dtype=np.int8, count=cells, offset=1).reshape(size).astype(int),
+        sheepState=np.frombuffer(data, dtype=np.int8, count=cells, offset=1+cells).reshape(size).astype(int),
+        current_player=data[0],
+    )
 
 class Move:
     def __init__(self, cell: tuple, sheep=None, dir=None, init=False, stay=False):
@@ -22,6 +59,27 @@ class Move:
     def print_move(self):
         print(self.hash)
 
+    # the packed int used by State, BitState and MCTS
+    @property
+    def code(self) -> int:
+        if self.init:
+            return encode_init(to_index(self.cell))
+        elif self.stay:
+            return STAY
+        else:
+            return encode_move(to_index(self.cell), int(self.sheep), self.dir)
+
+    @staticmethod
+    def decode(code: int):
+        if code == STAY:
+            return Move.freeze()
+
+        index, sheep, dir = decode_move(code)
+        if sheep == 0:
+            return Move(cell=COORDS[index], init=True)
+        else:
+            return Move(cell=COORDS[index], sheep=sheep, dir=dir)
+
     # return the hash value for "children" in mcts/Node"
     @property
     def hash(self):
@@ -79,6 +137,8 @@ class State:
         self.mapState = mapState
         self.sheepState = sheepState
         self.current_player = current_player # 1 ~ GameMeta.PLAYERS
+        self.geometry = Geometry.from_map(mapState) # neighbor & ray tables of the map
+        self.hash = get_hash(mapState, sheepState, current_player) # Zobrist hash, see zobrist.py
         self._init_cell_owners()       
         # keep track of cells of each player
         # { 
@@ -87,6 +147,21 @@ class State:
         #               ...
         # }
 
+        # (player, cell) moved from FREE to BLOCKED, in order
+        # so that "undo" can unwind the lazy updates of "get_valid_moves"
+        self.blocked_log = []
+
+        # connected regions of each player as a union-find over cell indices, kept up to date by "play"
+        # union by size without path compression, so that "undo" can split regions again
+        self.region_parent = list(range(CELLS))
+        self.region_size = [0] * CELLS
+        self.max_region = [0] * (GameMeta.PLAYERS+1) # size of the largest region of each player
+        self.region_log = [] # (player, cell index, root it was merged into or OFF, previous max_region)
+        for i, (x, y) in enumerate(COORDS):
+            if mapState[x][y] > 0:
+                self._claim(i, int(mapState[x][y]))
+        self.region_log = []
+
     def print_state(self):
         for i in range(GameMeta.BOARD_SIZE):
             if i % 2 == 1:
@@ -108,16 +183,13 @@ class State:
             
             print("")
 
-    # find the destination of a Move
-    def get_dest(self, move: Move) -> tuple:
-        dest_x, dest_y = move.cell
+    # find the destination of moving from "cell" towards "dir"
+    def get_dest(self, cell: tuple, dir: int) -> tuple:
+        dest_x, dest_y = cell
         
-        while True:
-            pattern_x, pattern_y = get_direction_pattern((dest_x, dest_y), move.dir)
-            next_x = dest_x + pattern_x
-            next_y = dest_y + pattern_y
-
-            if out_of_bound((next_x, next_y)) or self.mapState[next_x][next_y] != GameMeta.TOKENS["free"]:
+        for n in self.geometry.ray[to_index(cell)][dir]:
+            next_x, next_y = COORDS[n]
+            if self.mapState[next_x][next_y] != GameMeta.TOKENS["free"]:
                 break
             
             dest_x = next_x
@@ -125,7 +197,7 @@ class State:
         
         # ============= for debug purposes, delete before submission ============= 
         
-        if move.cell[0] == dest_x and move.cell[1] == dest_y:
+        if cell[0] == dest_x and cell[1] == dest_y:
             # The given Move does not move at all
             raise ValueError("This is an invalid move!")
 
@@ -142,45 +214,130 @@ class State:
         cells = self.cell_owners[player]
         return len(cells[self.BLOCKED]) + len(cells[self.FREE])
 
-    def play(self, move: Move):
-        if move.init:
-            self.init_pos(move)
-            return
+    # return an undo record which can be passed to "undo" to restore the state
+    # record: (move, player who played, destination, length of blocked_log, hash, length of region_log)
+    def play(self, move: int) -> tuple:
+        record = (move, self.current_player, None, len(self.blocked_log), self.hash, len(self.region_log))
 
         # not moving at all
-        if move.stay:
-            self.current_player = self.get_next_player(self.current_player)
-            return
+        if move == STAY:
+            self._pass_turn()
+            return record
+
+        index, sheep, dir = decode_move(move)
+        cell = COORDS[index]
 
-        dest_x, dest_y = self.get_dest(move)
+        if sheep == 0:
+            self.init_pos(cell)
+            return record
+
+        dest_x, dest_y = self.get_dest(cell, dir)
         
         # ============= for debug purposes, delete before submission ============= 
         
-        if self.mapState[move.cell[0]][move.cell[1]] != self.current_player:
-            print(f"{(move.cell)}={self.mapState[move.cell[0]][move.cell[1]] } does not belong to the current player {self.current_player}.")
+        if self.mapState[cell[0]][cell[1]] != self.current_player:
+            print(f"{cell}={self.mapState[cell[0]][cell[1]] } does not belong to the current player {self.current_player}.")
             print(self.cell_owners)
             raise ValueError()
 
         if self.mapState[dest_x][dest_y] != GameMeta.TOKENS["free"]:
             raise ValueError("The destination cell is unavailable.")
 
-        if self.sheepState[move.cell[0]][move.cell[1]] <= move.sheep:
+        if self.sheepState[cell[0]][cell[1]] <= sheep:
             print(self.current_player)
             print(self.cell_owners)
-            raise ValueError(f"{move.cell} does not have enough sheep.")
+            raise ValueError(f"{cell} does not have enough sheep.")
 
         if self.sheepState[dest_x][dest_y] != 0:
             raise ValueError("The destination cell is already occupied by sheep.")
 
         # ========================================================================
 
-        self.sheepState[move.cell[0]][move.cell[1]] -= move.sheep
+        keys = CELL_KEYS[index][self.current_player]
+        left = int(self.sheepState[cell[0]][cell[1]]) - sheep
+        self.hash ^= keys[left + sheep] ^ keys[left] ^ CELL_KEYS[to_index((dest_x, dest_y))][self.current_player][sheep]
+
+        self.sheepState[cell[0]][cell[1]] = left
 
         self.mapState[dest_x][dest_y] = self.current_player
-        self.sheepState[dest_x][dest_y] = move.sheep
-        self.cell_owners[self.current_player][self.FREE].add((dest_x, dest_y))
+        self.sheepState[dest_x][dest_y] = sheep
+        self._add_free(self.current_player, (dest_x, dest_y))
+        self._claim(to_index((dest_x, dest_y)), self.current_player)
+
+        self._pass_turn()
+
+        return (move, record[1], (dest_x, dest_y), record[3], record[4], record[5])
+
+    # return the hash after playing "move" without playing it
+    def get_hash_after(self, move: int) -> int:
+        player = self.current_player
+        hash = self.hash ^ PLAYER_KEYS[player] ^ PLAYER_KEYS[self.get_next_player(player)]
+        if move == STAY:
+            return hash
+
+        index, sheep, dir = decode_move(move)
+        keys = CELL_KEYS[index][player]
+        if sheep == 0:
+            return hash ^ keys[GameMeta.MAX_SHEEP]
+
+        x, y = COORDS[index]
+        left = int(self.sheepState[x][y]) - sheep
+        dest = to_index(self.get_dest((x, y), dir))
+        return hash ^ keys[left + sheep] ^ keys[left] ^ CELL_KEYS[dest][player][sheep]
+
+    # pass the turn of players who can no longer move (all their cells are BLOCKED)
+    # return an undo record if any player is skipped, None otherwise
+    # rollouts use this instead of playing STAY for each of them
+    def fast_forward(self):
+        player = self.current_player
+        record = (STAY, player, None, len(self.blocked_log), self.hash, len(self.region_log))
 
-        self.current_player = self.get_next_player(self.current_player)
+        while True:
+            cells = self.cell_owners[self.current_player]
+            if cells[self.FREE] or not cells[self.BLOCKED]:
+                break
+            self._pass_turn()
+
+            # ============= for debug purposes, delete before submission =============
+            if self.current_player == player:
+                raise ValueError("Every player is blocked, the game is over.")
+            # ========================================================================
+
+        return record if self.current_player != player else None
+
+    # revert a "play"
+    # records must be undone in the reverse order of the plays
+    def undo(self, record: tuple):
+        move, player, dest, log_len, self.hash, region_log_len = record
+
+        # cells blocked after the play are free again
+        while len(self.blocked_log) > log_len:
+            p, cell = self.blocked_log.pop()
+            self.cell_owners[p][self.BLOCKED].remove(cell)
+            self._add_free(p, cell)
+
+        # split the regions merged by the play
+        while len(self.region_log) > region_log_len:
+            p, index, root, self.max_region[p] = self.region_log.pop()
+            if root != OFF:
+                self.region_parent[index] = index
+                self.region_size[root] -= self.region_size[index]
+
+        if is_init(move):
+            cell = COORDS[move >> 7]
+            self.mapState[cell[0]][cell[1]] = GameMeta.TOKENS["free"]
+            self.sheepState[cell[0]][cell[1]] = 0
+            self._remove_free(player, cell)
+        elif move != STAY:
+            index, sheep, _ = decode_move(move)
+            x, y = COORDS[index]
+            dest_x, dest_y = dest
+            self.sheepState[x][y] += sheep
+            self.mapState[dest_x][dest_y] = GameMeta.TOKENS["free"]
+            self.sheepState[dest_x][dest_y] = 0
+            self._remove_free(player, dest)
+
+        self.current_player = player
 
     def _init_cell_owners(self):
         self.cell_owners = {}
@@ -196,6 +353,21 @@ class State:
                 if player in self.cell_owners:
                     self.cell_owners[player][self.FREE].add((i, j))
 
+        # number of players with FREE cells, the game is over when it drops to 0
+        self.active_players = sum(1 for cells in self.cell_owners.values() if cells[self.FREE])
+
+    def _add_free(self, player, cell: tuple):
+        cells = self.cell_owners[player][self.FREE]
+        if not cells:
+            self.active_players += 1
+        cells.add(cell)
+
+    def _remove_free(self, player, cell: tuple):
+        cells = self.cell_owners[player][self.FREE]
+        cells.remove(cell)
+        if not cells:
+            self.active_players -= 1
+
     # ************************************************************************
     # ************************** for move selections *************************
     # ************************************************************************
@@ -215,27 +387,119 @@ class State:
                 blocked_cells.append(cell)
                 continue
 
+            index = to_index(cell)
             for direction in valid_directions:
+                base = encode_move(index, 0, direction)
                 for num_sheep in valid_sheep:
-                    valid_move_list.append(Move(cell, num_sheep, direction))
+                    valid_move_list.append(base | (num_sheep << 3))
         
-        for cell in blocked_cells:
-            self.cell_owners[self.current_player][self.FREE].remove(cell)
-            self.cell_owners[self.current_player][self.BLOCKED].add(cell)
+        self._block_cells(blocked_cells)
 
         # cannot move at all
         if len(valid_move_list) == 0:
-            valid_move_list.append(Move.freeze())
+            valid_move_list.append(STAY)
 
         return valid_move_list
 
-    def init_pos(self, move: Move):
-        x, y = move.cell
+    # draw a move with the same distribution as random.choice(self.get_valid_moves())
+    # without building the move list, for rollouts
+    # rng: the random module or a random.Random instance
+    def get_random_move(self, rng=random) -> int:
+        cells = self.cell_owners[self.current_player]
+        if len(cells[self.FREE]) + len(cells[self.BLOCKED]) == 0:
+            return rng.choice(self._get_valid_init_moves())
+
+        # every stack is weighted by its number of valid moves
+        stacks = [] # (cell, valid directions, number of valid sheep)
+        total = 0
+        blocked_cells = []
+        for cell in cells[self.FREE]:
+            splits = int(self.sheepState[cell[0]][cell[1]]) - 1
+            valid_directions = self._get_valid_directions(cell) if splits > 0 else []
+
+            if len(valid_directions) == 0:
+                blocked_cells.append(cell)
+                continue
+
+            stacks.append((cell, valid_directions, splits))
+            total += len(valid_directions) * splits
+
+        self._block_cells(blocked_cells)
+
+        # cannot move at all
+        if total == 0:
+            return STAY
+
+        r = rng.randrange(total)
+        for cell, valid_directions, splits in stacks:
+            weight = len(valid_directions) * splits
+            if r < weight:
+                return encode_move(to_index(cell), r % splits + 1, valid_directions[r // splits])
+            r -= weight
+
+    # return the number of valid moves of "player" other than init moves and STAY
+    def count_moves(self, player) -> int:
+        count = 0
+        for cell in self.cell_owners[player][self.FREE]:
+            splits = int(self.sheepState[cell[0]][cell[1]]) - 1
+            if splits > 0:
+                count += len(self._get_valid_directions(cell)) * splits
+
+        return count
+
+    # return [len(valid moves after playing "move") for move in "moves"] without playing them
+    # i.e. the mobility of the next player, the heuristic of MCTS children
+    def count_moves_after(self, moves: list) -> list:
+        next_player = self.get_next_player(self.current_player)
+        cells = self.cell_owners[next_player]
+        if not cells[self.FREE] and not cells[self.BLOCKED]:
+            # the next player has to set the 1st piece, which is rare enough to play it out
+            counts = []
+            for move in moves:
+                record = self.play(move)
+                counts.append(len(self.get_valid_moves()))
+                self.undo(record)
+            return counts
+
+        # the move only occupies "dest", which takes 1 direction from every stack around it
+        base = self.count_moves(next_player)
+        dests = {} # (index, dir) -> count
+        counts = []
+        for move in moves:
+            if move == STAY:
+                count = base
+            else:
+                index, sheep, dir = decode_move(move)
+                count = dests.get((index, dir))
+                if count is None:
+                    dest = to_index(self.get_dest(COORDS[index], dir)) if sheep else index
+                    count = base
+                    for n in self.geometry.neighbor[dest][1:]:
+                        if n == OFF:
+                            continue
+                        x, y = COORDS[n]
+                        if self.mapState[x][y] == next_player and self.sheepState[x][y] > 1:
+                            count -= int(self.sheepState[x][y]) - 1
+                    dests[(index, dir)] = count
+
+            counts.append(max(count, 1)) # STAY if it cannot move at all
+
+        return counts
+
+    # move cells of the current player from FREE to BLOCKED
+    def _block_cells(self, blocked_cells: list):
+        for cell in blocked_cells:
+            self._remove_free(self.current_player, cell)
+            self.cell_owners[self.current_player][self.BLOCKED].add(cell)
+            self.blocked_log.append((self.current_player, cell))
+
+    def init_pos(self, cell: tuple):
+        x, y = cell
 
         # ============= for debug purposes, delete before submission ============= 
         
         if self.mapState[x][y] != GameMeta.TOKENS["free"] or self.sheepState[x][y] != 0:
-            print(f"{move.cell} is blocked")
+            print(f"{cell} is blocked")
             self.print_state()
             raise ValueError()
 
@@ -247,9 +511,48 @@ class State:
 
         self.mapState[x][y] = self.current_player
         self.sheepState[x][y] = GameMeta.MAX_SHEEP
-        self.cell_owners[self.current_player][self.FREE].add(move.cell)
+        self._add_free(self.current_player, cell)
+        self.hash ^= CELL_KEYS[to_index(cell)][self.current_player][GameMeta.MAX_SHEEP]
+        self._claim(to_index(cell), self.current_player)
 
-        self.current_player = self.get_next_player(self.current_player)
+        self._pass_turn()
+
+    # add the new cell "index" of "player" to the union-find of regions
+    def _claim(self, index: int, player):
+        self.region_parent[index] = index
+        self.region_size[index] = 1
+        self.region_log.append((player, index, OFF, self.max_region[player]))
+
+        root = index
+        for n in self.geometry.neighbor[index][1:]:
+            if n == OFF:
+                continue
+            x, y = COORDS[n]
+            if self.mapState[x][y] != player:
+                continue
+
+            other = self._find_region(n)
+            if other == root:
+                continue
+
+            # the smaller region is merged into the larger one
+            if self.region_size[other] > self.region_size[root]:
+                root, other = other, root
+            self.region_log.append((player, other, root, self.max_region[player]))
+            self.region_parent[other] = root
+            self.region_size[root] += self.region_size[other]
+
+        self.max_region[player] = max(self.max_region[player], self.region_size[root])
+
+    def _find_region(self, index: int) -> int:
+        while self.region_parent[index] != index:
+            index = self.region_parent[index]
+        return index
+
+    def _pass_turn(self):
+        next_player = self.get_next_player(self.current_player)
+        self.hash ^= PLAYER_KEYS[self.current_player] ^ PLAYER_KEYS[next_player]
+        self.current_player = next_player
 
     def _get_valid_init_moves(self) -> list:
         valid_moves = []
@@ -261,11 +564,14 @@ class State:
 
                 walls = 0
                 frees = 0
+                adjacent = self.geometry.neighbor[to_index((i, j))]
                 for d in GameMeta.DIRECTIONS:
-                    neighbor = get_neighbor((i, j), d, self.mapState)
-                    if neighbor == GameMeta.TOKENS["wall"]:
+                    if adjacent[d] == OFF:
                         walls += 1
-                    elif neighbor == GameMeta.TOKENS["free"]:
+                        continue
+
+                    n_x, n_y = COORDS[adjacent[d]]
+                    if self.mapState[n_x][n_y] == GameMeta.TOKENS["free"]:
                         frees += 1
 
                     if walls and frees:
@@ -275,19 +581,21 @@ class State:
                 # 2. a cell can be valid even if blocked in all 6 directions
                 #    but it makes no sense to init at such a position
                 if walls and frees:
-                    valid_moves.append(Move(cell=(i,j), init=True))
+                    valid_moves.append(encode_init(to_index((i, j))))
 
         return valid_moves
 
     # return valid direction to move for the given cell
     def _get_valid_directions(self, cell: tuple) -> list:
         valid_directions = []
+        adjacent = self.geometry.neighbor[to_index(cell)]
 
         for dir in GameMeta.DIRECTIONS:
-            pattern = get_direction_pattern(cell, dir)
-            next_cell = (cell[0] + pattern[0], cell[1] + pattern[1])
+            if adjacent[dir] == OFF:
+                continue
 
-            if not out_of_bound(next_cell) and self.mapState[next_cell[0]][next_cell[1]] == GameMeta.TOKENS["free"]:
+            next_x, next_y = COORDS[adjacent[dir]]
+            if self.mapState[next_x][next_y] == GameMeta.TOKENS["free"]:
                 valid_directions.append(dir)
 
         return valid_directions
@@ -306,21 +614,123 @@ class State:
     # ************************************************************************
 
     def gameover(self) -> bool:
-        blocked_cells = 0
-
-        for cells in self.cell_owners.values():
-            if len(cells[self.FREE]) != 0:
-                return False
-            blocked_cells += len(cells[self.BLOCKED])
-        
-        if blocked_cells == 0: # the game has not even started
+        if self.active_players != 0:
             return False
-        else:
-            return True
+
+        # the game has not even started if nobody has any cell
+        return any(cells[self.BLOCKED] for cells in self.cell_owners.values())
 
     # return points of all players based on rankings & scores
     def get_points(self) -> dict:
-        scores = [ (self._get_score(p), p) for p in self.cell_owners ] # (score, player)
+        return self.scores_to_points({ p: self._get_score(p) for p in self.cell_owners })
+
+    # return points of all players if the rankings can no longer change, None otherwise
+    # a player can gain at most min(sheep that can still split, free cells reachable by the stacks)
+    # cells, which bounds the final score from above
+    def get_decided_points(self):
+        free = [i for i, (x, y) in enumerate(COORDS) if self.mapState[x][y] == GameMeta.TOKENS["free"]]
+        region = self._label_free_regions(free)
+
+        lower = {}
+        upper = {}
+        for p, cells in self.cell_owners.items():
+            cnt = len(cells[self.FREE]) + len(cells[self.BLOCKED])
+            lower[p] = 3 * cnt + self.max_region[p]
+
+            splits = 0
+            reachable = set() # labels of free regions next to the stacks
+            for cell in cells[self.FREE]:
+                sheep = int(self.sheepState[cell[0]][cell[1]])
+                adjacent = [region[n] for n in self.geometry.neighbor[to_index(cell)][1:] if n != OFF and n in region]
+                if sheep > 1 and adjacent:
+                    splits += sheep - 1
+                    reachable.update(adjacent)
+
+            # new cells can merge regions, so the largest region is only bounded by all cells
+            gain = min(splits, sum(region[label] for label in reachable)) if splits else 0
+            upper[p] = 4 * (cnt + gain) if gain else lower[p]
+
+        return self.decided_points(lower, upper)
+
+    # return the number of free cells in the regions next to stacks that can still move
+    def count_reachable_free(self) -> int:
+        free = [i for i, (x, y) in enumerate(COORDS) if self.mapState[x][y] == GameMeta.TOKENS["free"]]
+        region = self._label_free_regions(free)
+
+        reachable = set()
+        for cells in self.cell_owners.values():
+            for cell in cells[self.FREE]:
+                if self.sheepState[cell[0]][cell[1]] > 1:
+                    reachable.update(region[n] for n in self.geometry.neighbor[to_index(cell)][1:] if n != OFF and n in region)
+
+        return sum(region[label] for label in reachable)
+
+    # return (free regions, stacks) of the board
+    #   free regions: list of tuples of the cell indices of each connected region of free cells
+    #   stacks: {cell index: (owner, sheep, indices of the free regions next to it)} of stacks that can still move
+    def get_free_regions(self) -> tuple:
+        free = [i for i, (x, y) in enumerate(COORDS) if self.mapState[x][y] == GameMeta.TOKENS["free"]]
+        region = self._label_free_regions(free)
+
+        regions = {}
+        for i in free:
+            regions.setdefault(region[i], []).append(i)
+        labels = {label: r for r, label in enumerate(regions)}
+
+        stacks = {}
+        for p, cells in self.cell_owners.items():
+            for cell in cells[self.FREE]:
+                sheep = int(self.sheepState[cell[0]][cell[1]])
+                index = to_index(cell)
+                adjacent = {labels[region[n]] for n in self.geometry.neighbor[index][1:] if n != OFF and n in region}
+                if sheep > 1 and adjacent:
+                    stacks[index] = (p, sheep, adjacent)
+
+        return [tuple(cells) for cells in regions.values()], stacks
+
+    # region[cell index] = label of the connected region of free cells
+    # region[label] = size of the region, labels are negative to tell them from cells
+    def _label_free_regions(self, free: list) -> dict:
+        region = {}
+        label = 0
+        for i in free:
+            if i in region:
+                continue
+
+            label -= 1
+            region[i] = label
+            stack = [i]
+            size = 0
+            while stack:
+                n = stack.pop()
+                size += 1
+                for m in self.geometry.neighbor[n][1:]:
+                    if m != OFF and m not in region and self.mapState[COORDS[m][0]][COORDS[m][1]] == GameMeta.TOKENS["free"]:
+                        region[m] = label
+                        stack.append(m)
+            region[label] = size
+
+        return region
+
+    # return the points of the rankings if the order of every pair of players is fixed
+    # lower / upper: {player: bounds of the final score}
+    @staticmethod
+    def decided_points(lower: dict, upper: dict):
+        players = list(lower)
+        for i, p in enumerate(players):
+            for q in players[i+1:]:
+                if lower[p] == upper[p] and lower[q] == upper[q]:
+                    continue # both scores are final, ties included
+                if lower[p] > upper[q] or lower[q] > upper[p]:
+                    continue
+                return None
+
+        return State.scores_to_points(lower)
+
+    # convert scores {player: score} to points based on rankings
+    @staticmethod
+    def scores_to_points(player_scores: dict) -> dict:
+        scores = [ (score, p) for p, score in player_scores.items() ] # (score, player)
         scores = sorted(scores, reverse=True)
         
         rankings = [[scores[0][1]]]
@@ -347,15 +757,5 @@ class State:
             raise ValueError()
         # ========================================================================
         
-        cells = self.cell_owners[player]["blocked"]
-        groups = Group(cells).get_connect_regions()
-        
-        score = 0
-        max_size = 0
-        for group in groups:
-            score += 3 * len(group)
-
-            if len(group) > max_size:
-                max_size = len(group)
-
-        return score+max_size
+        # 3 points per cell + the size of the largest connected region
+        return 3 * len(self.cell_owners[player][self.BLOCKED]) + self.max_region[player]
@@ -0,0 +1,162 @@
+from multiprocessing import shared_memory
+import os
+import numpy as np
+
+# a search tree kept as arrays, a node is an index into every field
+#   N, Q:          visits & total points of the player who moved into the node
+#   H, plays:      heuristic & number of plays of the owner (see mcts.StoreTree.get_values)
+#   owner:         player to move at the node
+#   move:          packed move from the parent (see state.py)
+#   parent:        index of the parent, NONE for the root
+#   first_child:   children are stored at first_child ~ first_child+child_count-1
+#   child_count:   0 if not expanded yet
+#   hash:          Zobrist hash of the position (see zobrist.py)
+FIELDS = [
+    ("N", np.int64),
+    ("Q", np.float64),
+    ("H", np.float64),
+    ("plays", np.int16),
+    ("owner", np.int8),
+    ("move", np.int32),
+    ("parent", np.int32),
+    ("first_child", np.int32),
+    ("child_count", np.int32),
+    ("hash", np.uint64),
+]
+
+NONE = -1
+
+def _get_layout(capacity: int) -> tuple:
+    offsets = {}
+    offset = 8 # the 1st 8 bytes keep the number of allocated nodes
+    for name, dtype in FIELDS:
+        offsets[name] = offset
+        offset += capacity * np.dtype(dtype).itemsize
+        offset = (offset + 7) // 8 * 8
+
+    return offsets, offset
+
+class NodeStore:
+    # growable: double the capacity instead of failing when the store is full
+    #           (arrays are reallocated, so views of the fields must not be kept)
+    def __init__(self, capacity: int, buffer=None, growable=False):
+        offsets, nbytes = _get_layout(capacity)
+        if buffer is None:
+            buffer = bytearray(nbytes)
+
+        self.capacity = capacity
+        self.growable = growable
+        self._size = np.ndarray((1,), dtype=np.int64, buffer=buffer, offset=0)
+        for name, dtype in FIELDS:
+            setattr(self, name, np.ndarray((capacity,), dtype=dtype, buffer=buffer, offset=offsets[name]))
+
+    @property
+    def size(self) -> int:
+        return int(self._size[0])
+
+    def clear(self):
+        self._size[0] = 0
+
+    # reserve "count" consecutive nodes and return the 1st index, NONE if the store is full
+    def allocate(self, count: int) -> int:
+        start = self.size
+        if start + count > self.capacity:
+            if not self.growable:
+                return NONE
+            self._grow(max(2 * self.capacity, start + count))
+
+        self._size[0] = start + count
+        return start
+
+    def _grow(self, capacity: int):
+        size = self.size
+        for name, dtype in FIELDS:
+            field = np.empty(capacity, dtype=dtype)
+            field[:size] = getattr(self, name)[:size]
+            setattr(self, name, field)
+        self.capacity = capacity
+
+    def init_node(self, index: int, owner, move=NONE, parent=NONE, plays=0, hash=0):
+        self.N[index] = 0
+        self.Q[index] = 0
+        self.H[index] = 0
+        self.plays[index] = plays
+        self.owner[index] = owner
+        self.move[index] = move
+        self.parent[index] = parent
+        self.first_child[index] = NONE
+        self.child_count[index] = 0
+        self.hash[index] = hash
+
+    # return the child of "index" reached by "move", NONE if not expanded
+    def find_child(self, index: int, move: int) -> int:
+        first = self.first_child[index]
+        for child in range(first, first + self.child_count[index]):
+            if self.move[child] == move:
+                return child
+
+        return NONE
+
+    # return a new store holding only the subtree of "root", which becomes node 0
+    # children stay consecutive since nodes are copied level by level
+    def extract(self, root: int) -> "NodeStore":
+        levels = [np.array([root])]
+        while True:
+            nodes = levels[-1]
+            counts = self.child_count[nodes]
+            nodes, counts = nodes[counts > 0], counts[counts > 0]
+            if len(nodes) == 0:
+                break
+            # children of each node in order
+            starts = np.repeat(self.first_child[nodes] - np.cumsum(counts) + counts, counts)
+            levels.append(starts + np.arange(counts.sum()))
+
+        order = np.concatenate(levels)
+        new_of = np.full(self.size, NONE, dtype=np.int32)
+        new_of[order] = np.arange(len(order))
+
+        store = NodeStore(max(self.capacity // 2, len(order)), growable=self.growable)
+        store._size[0] = len(order)
+        for name, _ in FIELDS:
+            getattr(store, name)[:len(order)] = getattr(self, name)[order]
+
+        expanded = store.child_count[:len(order)] > 0
+        store.first_child[:len(order)][expanded] = new_of[store.first_child[:len(order)][expanded]]
+        store.parent[1:len(order)] = new_of[store.parent[1:len(order)]]
+        store.parent[0] = NONE
+        return store
+
+    # bytes used per node
+    @staticmethod
+    def node_bytes() -> int:
+        return sum(np.dtype(dtype).itemsize for _, dtype in FIELDS)
+
+class SharedNodeStore(NodeStore):
+    # a NodeStore in multiprocessing.shared_memory, shared by worker processes
+    # "lock" guards allocations & expansions, counters are updated without locking
+
+    def __init__(self, capacity: int, lock, name: str = None):
+        _, nbytes = _get_layout(capacity)
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            self.creator = os.getpid() # forked workers inherit this object but must not unlink
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.creator = None
+
+        self.lock = lock
+        super().__init__(capacity, self.shm.buf)
+
+    # workers attach to the same memory by name
+    def __reduce__(self):
+        return (SharedNodeStore, (self.capacity, self.lock, self.shm.name))
+
+    def close(self):
+        # arrays must be released before the memory is closed
+        for name, _ in FIELDS:
+            setattr(self, name, None)
+        self._size = None
+
+        self.shm.close()
+        if self.creator == os.getpid():
+            self.shm.unlink()
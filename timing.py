@@ -0,0 +1,75 @@
+import gc
+from time import time as clock
+import numpy as np
+from meta import GameMeta, MCTSMeta
+
+class TimeManager:
+    # budget of the searches within the time limit of each turn
+    # a turn starts when the board is received and ends when the step is sent
+    #   - the time spent before the search (updating the tree ...) is taken off the budget
+    #   - the time spent after the search (choosing the move, re-rooting, sending the step ...)
+    #     is measured every turn and kept off the budget as well, as a maximum that decays
+    #     by MCTSMeta.OVERHEAD_DECAY per turn so that one slow turn does not shrink every later budget
+    #   - "margin" is kept on top of both for the round trip to the server
+    # a search may stop early once the most visited root move cannot be overtaken (see is_decided)
+    # gc_control: the cyclic garbage collector is disabled, so that it never pauses a turn,
+    #             and run between turns instead (after the step is sent)
+    #             objects alive after the 1st turn (modules, the agent ...) are frozen once
+    #             so that the collections between turns skip them
+
+    def __init__(self, time_limit=GameMeta.TIME_LIMIT, margin=MCTSMeta.TIME_MARGIN, gc_control=MCTSMeta.GC_CONTROL, overhead_decay=MCTSMeta.OVERHEAD_DECAY):
+        self.time_limit = time_limit
+        self.margin = margin
+        self.overhead = 0.0 # decaying maximum of the time from the end of a search to the end of its turn
+        self.overhead_decay = overhead_decay
+        self.turn_start = clock()
+        self.search_end = None
+
+        self.turn_time = 0.0 # seconds of the last turn
+        self.saved = 0.0     # seconds of budgets left unused by early stops over the game
+        self.latencies = []  # seconds of every turn, from receiving the board to sending the step
+
+        self.gc_control = gc_control
+        self.gc_time = 0.0   # seconds of the last collection between turns
+        if gc_control:
+            gc.disable()
+
+    # "start": time the board was received, now if not given
+    def start_turn(self, start: float=None):
+        self.turn_start = start if start is not None else clock()
+        self.search_end = None
+
+    # seconds left for the search of this turn
+    def get_budget(self) -> float:
+        return max(self.time_limit - self.margin - self.overhead - (clock() - self.turn_start), 0.0)
+
+    def end_search(self, budget: float, elapsed: float):
+        self.search_end = clock()
+        self.saved += max(budget - elapsed, 0.0)
+
+    def end_turn(self):
+        now = clock()
+        if self.search_end is not None:
+            self.overhead = max(self.overhead * self.overhead_decay, now - self.search_end)
+        self.turn_time = now - self.turn_start
+        self.latencies.append(self.turn_time)
+
+        if self.gc_control:
+            gc.collect()
+            # only once: freezing every turn would hide objects that become garbage later on
+            if len(self.latencies) == 1:
+                gc.freeze()
+            self.gc_time = clock() - now
+
+    # the "q"-th percentile of the turn latencies in seconds
+    def get_latency(self, q: float) -> float:
+        return float(np.percentile(self.latencies, q)) if self.latencies else 0.0
+
+    # the move with the most visits "N" among the root children stays the most visited one
+    # even if all "simulations" still to come went to the runner-up
+    @staticmethod
+    def is_decided(N: np.ndarray, simulations: float) -> bool:
+        if len(N) < 2:
+            return True
+        second, first = np.partition(N, len(N) - 2)[-2:]
+        return first - second > simulations
@@ -0,0 +1,78 @@
+import numpy as np
+
+NONE = -1
+
+class TranspositionTable:
+    # statistics of positions shared by all tree nodes with the same Zobrist hash
+    #   N, Q: visits & total points of the player who moved into the position
+    # the table has "capacity" entries in buckets of WAYS entries chosen by the low bits of the hash
+    # when a bucket is full, the least visited entry is evicted
+    WAYS = 4
+
+    def __init__(self, capacity: int):
+        assert capacity & (capacity - 1) == 0 and capacity >= self.WAYS, "capacity must be a power of 2"
+
+        self.capacity = capacity
+        self.mask = capacity // self.WAYS - 1
+        self.key = np.zeros(capacity, dtype=np.uint64)
+        self.N = np.zeros(capacity, dtype=np.int64)
+        self.Q = np.zeros(capacity, dtype=np.float64)
+
+        self.probes = 0    # positions looked up when nodes are created
+        self.hits = 0      # of which already had statistics from another path
+        self.evictions = 0
+
+    def clear(self):
+        self.key[:] = 0
+        self.N[:] = 0
+        self.Q[:] = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.evictions = 0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
+
+    # halve the statistics of all entries keeping Q/N, called once per own turn (see MCTS.search)
+    # positions which are no longer reached fade out and get evicted first
+    def age(self):
+        N = self.N >> 1
+        self.Q *= N / np.maximum(self.N, 1)
+        self.N = N
+
+    # return the entries of "hashes" (np.uint64 array), NONE where not in the table
+    # counted as probes if "count" is set
+    def find(self, hashes: np.ndarray, count=False) -> np.ndarray:
+        slots = (hashes & np.uint64(self.mask)).astype(np.intp)[:, None] * self.WAYS + np.arange(self.WAYS)
+        found = (self.key[slots] == hashes[:, None]) & (self.N[slots] > 0)
+        entries = np.where(found.any(axis=1), slots[np.arange(len(hashes)), found.argmax(axis=1)], NONE)
+
+        if count:
+            self.probes += len(hashes)
+            self.hits += int((entries != NONE).sum())
+
+        return entries
+
+    # add "visits" games to the entries of "hashes" (np.uint64 array of distinct positions)
+    # "points": total points of the player who moved into each position
+    def update(self, hashes: np.ndarray, visits, points: np.ndarray):
+        entries = self.find(hashes)
+        points = np.broadcast_to(np.asarray(points, dtype=np.float64), entries.shape)
+
+        found = entries != NONE
+        self.N[entries[found]] += visits
+        self.Q[entries[found]] += points[found]
+
+        # new positions replace the least visited entry of their bucket
+        for i in np.flatnonzero(~found):
+            start = int(hashes[i] & np.uint64(self.mask)) * self.WAYS
+            entry = start + int(np.argmin(self.N[start:start + self.WAYS]))
+            if self.N[entry] > 0:
+                self.evictions += 1
+            self.key[entry] = hashes[i]
+            self.N[entry] = visits
+            self.Q[entry] = points[i]
@@ -1,4 +1,5 @@
 from meta import GameMeta
+from geometry import get_direction_pattern, out_of_bound, to_index, COORDS, NEIGHBORS, OFF
 import numpy as np
 import random
 
@@ -59,37 +60,6 @@ def print_board(board):
 # ==============================================================================
 # ==============================================================================
 
-def get_direction_pattern(cell, dir) -> tuple:
-    x, _ = cell
-
-    if dir == 1:
-        return ((-1, -1) if x % 2 == 0 else (-1, 0))
-    elif dir == 2:
-        return ((-1, 0) if x % 2 == 0 else (-1, 1))
-    elif dir == 3:
-        return (0, -1)
-    elif dir == 4:
-        return (0, 1)
-    elif dir == 5:
-        return ((1, -1) if x % 2 == 0 else (1, 0))
-    elif dir == 6:
-        return ((1, 0) if x % 2 == 0 else (1, 1))
-    # ============= for debug purposes, delete before submission =============
-    else:
-        print(f"Unrecognized direction: {dir}.")
-        raise ValueError()
-    # ========================================================================
-
-def out_of_bound(cell: tuple) -> bool:
-    x, y = cell
-
-    if x < 0 or x >= GameMeta.BOARD_SIZE:
-        return True
-    elif y < 0 or y >= GameMeta.BOARD_SIZE:
-        return True
-    else:
-        return False
-
 def evaluate_init_pos(pos, board):
     i, j = pos
     if board[i][j] != GameMeta.TOKENS["free"]:
@@ -119,29 +89,26 @@ def evaluate_init_pos(pos, board):
     return ( frees if walls != 0 else -GameMeta.INF )
 
 def get_dest(src, dir, board) -> tuple:
-    dest_x, dest_y = src
+    dest = src
+    n = NEIGHBORS[to_index(src)][dir]
         
-    while True:
-        pattern_x, pattern_y = get_direction_pattern((dest_x, dest_y), dir)
-        next_x = dest_x + pattern_x
-        next_y = dest_y + pattern_y
-
-        if out_of_bound((next_x, next_y)) or board[next_x][next_y] != GameMeta.TOKENS["free"]:
+    while n != OFF:
+        next_x, next_y = COORDS[n]
+        if board[next_x][next_y] != GameMeta.TOKENS["free"]:
             break
             
-        dest_x = next_x
-        dest_y = next_y
+        dest = (next_x, next_y)
+        n = NEIGHBORS[n][dir]
 
-    return (dest_x, dest_y)
+    return dest
 
 def get_neighbor(pos, dir, board):
-    x, y = pos
-    pat_x, pat_y = get_direction_pattern(pos, dir)
-    n_x, n_y = x+pat_x, y+pat_y
+    n = NEIGHBORS[to_index(pos)][dir]
 
-    if out_of_bound((n_x, n_y)):
+    if n == OFF:
         return GameMeta.TOKENS["wall"]
     else:
+        n_x, n_y = COORDS[n]
         return board[n_x][n_y]
 
 def distance(src, dst, dir):
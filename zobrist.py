@@ -0,0 +1,23 @@
+from meta import GameMeta
+from geometry import CELLS, COORDS
+import random
+
+# Zobrist keys: the hash of a state is the xor of
+#   CELL_KEYS[index][owner][sheep] of every occupied cell
+#   PLAYER_KEYS[current player]
+# keys are drawn from a fixed seed so that hashes agree across processes
+_rng = random.Random(0x5eed)
+CELL_KEYS = [
+    [[_rng.getrandbits(64) for _ in range(GameMeta.MAX_SHEEP+1)] for _ in range(GameMeta.PLAYERS+1)]
+    for _ in range(CELLS)
+]
+PLAYER_KEYS = [_rng.getrandbits(64) for _ in range(GameMeta.PLAYERS+1)]
+
+def get_hash(mapState, sheepState, current_player) -> int:
+    hash = PLAYER_KEYS[current_player]
+    for i, (x, y) in enumerate(COORDS):
+        owner = int(mapState[x][y])
+        if owner > 0:
+            hash ^= CELL_KEYS[i][owner][int(sheepState[x][y])]
+
+    return hash